@@ -0,0 +1,183 @@
+import os
+import json
+import time
+import heapq
+import datetime
+import threading
+import statistics
+
+# ===== CONFIG =====
+ALARM_FILE = "alarms.json"
+MISSED_GRACE = 300      # on restart, alarms missed by less than this still fire
+PM_WORDS = ("pm", "afternoon", "evening")
+AM_WORDS = ("am", "morning")
+NIGHT_WORDS = ("night",)
+NIGHT_PM_FROM = 6       # "9 at night" is 21:00, but "3 at night" is 03:00
+# ==================
+
+
+class Alarm:
+    def __init__(self, alarm_id, fire_at):
+        self.id = alarm_id
+        self.fire_at = fire_at
+
+    def label(self):
+        return time.strftime("%I:%M %p, %a %d %b", time.localtime(self.fire_at))
+
+    def to_dict(self):
+        return {"id": self.id, "fire_at": self.fire_at}
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(d["id"], d["fire_at"])
+
+
+def next_occurrence(hour, minute=None, ampm=None, now=None):
+    """Next wall-clock timestamp for hour:minute, honouring an AM/PM word."""
+    hour = int(hour)
+    minute = int(minute or 0)
+    if not (0 <= hour <= 23 and 0 <= minute <= 59):
+        raise ValueError(f"invalid alarm time {hour}:{minute}")
+
+    word = (ampm or "").lower()
+    if word in NIGHT_WORDS:
+        if hour == 12:
+            hour = 0
+        elif NIGHT_PM_FROM <= hour < 12:
+            hour += 12
+    elif word in PM_WORDS and hour < 12:
+        hour += 12
+    elif word in AM_WORDS and hour == 12:
+        hour = 0
+
+    now = now or datetime.datetime.now()
+    target = now.replace(hour=hour, minute=minute, second=0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return target.timestamp()
+
+
+class AlarmScheduler:
+    """Alarms kept in a min-heap on fire time.
+
+    One thread sleeps exactly until the earliest alarm (or until the heap
+    changes) and calls on_fire(alarm, late) for each one that comes due.
+    """
+
+    def __init__(self, on_fire, path=ALARM_FILE):
+        self.on_fire = on_fire
+        self.path = path
+        self.heap = []              # (fire_at, id, Alarm)
+        self.next_id = 1
+        self.jitter = []            # seconds late, per fired alarm
+        self.cond = threading.Condition()
+        self.running = True
+
+        self.load()
+        threading.Thread(target=self.run, daemon=True).start()
+
+    # ---- Persistence ----
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[ALARM] could not load {self.path}: {e}")
+            return
+
+        now = time.time()
+        for d in data.get("alarms", []):
+            alarm = Alarm.from_dict(d)
+            if alarm.fire_at < now - MISSED_GRACE:
+                print(f"[ALARM] dropping missed alarm {alarm.label()}")
+                continue
+            heapq.heappush(self.heap, (alarm.fire_at, alarm.id, alarm))
+        self.next_id = max([data.get("next_id", 1)] + [a.id + 1 for _, _, a in self.heap])
+
+    def save(self):
+        data = {
+            "next_id": self.next_id,
+            "alarms": [a.to_dict() for _, _, a in sorted(self.heap)],
+        }
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp, self.path)
+
+    # ---- API ----
+    def add(self, fire_at):
+        with self.cond:
+            alarm = Alarm(self.next_id, fire_at)
+            self.next_id += 1
+            heapq.heappush(self.heap, (fire_at, alarm.id, alarm))
+            self.save()
+            self.cond.notify()
+        return alarm
+
+    def alarms(self):
+        """Pending alarms, earliest first. Numbering for remove() follows this order."""
+        with self.cond:
+            return [a for _, _, a in sorted(self.heap)]
+
+    def remove(self, number=None):
+        """Remove alarm #number (1-based, earliest first), or all alarms if None."""
+        with self.cond:
+            ordered = sorted(self.heap)
+            if number is None:
+                removed = [a for _, _, a in ordered]
+                self.heap = []
+            else:
+                number = int(number)
+                if not 1 <= number <= len(ordered):
+                    return []
+                removed = [ordered.pop(number - 1)[2]]
+                self.heap = ordered     # a sorted list is already a valid heap
+            self.save()
+            self.cond.notify()
+        return removed
+
+    def jitter_stats(self):
+        """(count, mean_ms, max_ms) of how late alarms fired."""
+        if not self.jitter:
+            return 0, 0.0, 0.0
+        return (len(self.jitter),
+                statistics.mean(self.jitter) * 1000,
+                max(self.jitter) * 1000)
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    # ---- Scheduler thread ----
+    def run(self):
+        while True:
+            due = []
+            with self.cond:
+                while self.running:
+                    if not self.heap:
+                        self.cond.wait()
+                        continue
+                    delay = self.heap[0][0] - time.time()
+                    if delay > 0:
+                        self.cond.wait(delay)
+                        continue
+                    break
+                if not self.running:
+                    return
+
+                now = time.time()
+                while self.heap and self.heap[0][0] <= now:
+                    fire_at, _, alarm = heapq.heappop(self.heap)
+                    late = now - fire_at
+                    self.jitter.append(late)
+                    due.append((alarm, late))
+                try:
+                    self.save()
+                except OSError as e:
+                    print(f"[ALARM] could not save {self.path}: {e}")
+
+            for alarm, late in due:
+                self.on_fire(alarm, late)
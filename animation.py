@@ -0,0 +1,65 @@
+import base64
+
+# ===== CONFIG =====
+MOUTH_LEVELS = ("closed", "half", "open")   # what PrintOutput reports
+EYES_WIDE_ABOVE = 0.85                      # envelope level that widens the eyes
+# ==================
+
+
+class ActuatorOutput:
+    """Where animation values go: set(actuator, value) with value in 0.0-1.0."""
+
+    def set(self, actuator, value):
+        raise NotImplementedError
+
+
+class NullOutput(ActuatorOutput):
+    def set(self, actuator, value):
+        pass
+
+
+class PrintOutput(ActuatorOutput):
+    """Console stand-in for the servos: prints only when the coarse position changes."""
+
+    def __init__(self):
+        self.last = {}
+
+    def set(self, actuator, value):
+        level = MOUTH_LEVELS[min(len(MOUTH_LEVELS) - 1, int(value * len(MOUTH_LEVELS)))]
+        if self.last.get(actuator) != level:
+            self.last[actuator] = level
+            print(f"[ACTUATOR] {actuator} {level}")
+
+
+class AnimationTrack:
+    """Drives MOUTH/EYES from a clip's precomputed envelope.
+
+    seek() is called with the playback position as audio is written, so
+    the mouth follows the clip without any DSP at runtime.
+    """
+
+    def __init__(self, envelope, step_ms, output):
+        self.envelope = envelope
+        self.step = step_ms / 1000
+        self.output = output
+        self.index = -1
+
+    @classmethod
+    def for_clip(cls, entry, output):
+        """Track from a clip_meta entry, or None if the clip has no envelope."""
+        if not entry or "envelope" not in entry:
+            return None
+        return cls(base64.b64decode(entry["envelope"]), entry["envelope_ms"], output)
+
+    def seek(self, seconds):
+        index = min(int(seconds / self.step), len(self.envelope) - 1)
+        if index == self.index or index < 0:
+            return
+        self.index = index
+        value = self.envelope[index] / 255
+        self.output.set("MOUTH", value)
+        self.output.set("EYES", 1.0 if value > EYES_WIDE_ABOVE else 0.0)
+
+    def finish(self):
+        self.output.set("MOUTH", 0.0)
+        self.output.set("EYES", 0.0)
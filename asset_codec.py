@@ -0,0 +1,313 @@
+import os
+import sys
+import time
+import wave
+import zlib
+import struct
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+import audio_backend
+
+# ===== CONFIG =====
+EXT = audio_backend.PACKED_EXT
+MAGIC = b"FZC1"
+BLOCK_FRAMES = 4096             # ~93ms at 44.1kHz, the unit of decode and caching
+MAX_ORDER = 2                   # highest delta predictor order tried per block
+CACHE_BYTES = 8 * 1024 * 1024   # decoded PCM kept in memory across clips
+# ==================
+#
+# File layout (little endian):
+#   header   MAGIC, channels u16, sampwidth u16, rate u32, nframes u32,
+#            block_frames u32, nblocks u32
+#   index    nblocks × (offset u32, length u32)
+#   blocks   zlib(order u8 + low-byte plane + high-byte plane)
+#
+# Each block stores the order-N delta of the 16-bit samples (per channel,
+# wrapping), split into byte planes so deflate sees the mostly-zero high
+# bytes together. Decoding is an inflate plus N vectorized cumsums, and is
+# bit-exact with the source WAV.
+
+HEADER = struct.Struct("<4sHHIIII")
+INDEX_ENTRY = struct.Struct("<II")
+
+
+# ===== ENCODER =====
+def encode_block(samples):
+    """samples: (frames, channels) int16 → compressed block bytes."""
+    best = None
+    residual = samples
+    for order in range(MAX_ORDER + 1):
+        if order:
+            residual = np.diff(residual, axis=0, prepend=np.zeros((1, residual.shape[1]), np.int16))
+        raw = residual.astype("<i2").view(np.uint8).reshape(-1, 2)
+        planes = np.concatenate([raw[:, 0], raw[:, 1]])
+        packed = zlib.compress(bytes([order]) + planes.tobytes(), 9)
+        if best is None or len(packed) < len(best):
+            best = packed
+    return best
+
+
+def encode_file(src, dst=None):
+    """Encode one WAV into the packed format. Returns (wav_bytes, packed_bytes)."""
+    dst = dst or os.path.splitext(src)[0] + EXT
+    with wave.open(src, "rb") as wf:
+        channels = wf.getnchannels()
+        sampwidth = wf.getsampwidth()
+        rate = wf.getframerate()
+        nframes = wf.getnframes()
+        if sampwidth != 2:
+            raise ValueError(f"{src}: only 16-bit PCM is supported")
+        pcm = np.frombuffer(wf.readframes(nframes), "<i2").reshape(-1, channels)
+
+    blocks = [encode_block(pcm[i:i + BLOCK_FRAMES]) for i in range(0, len(pcm), BLOCK_FRAMES)]
+
+    offset = HEADER.size + INDEX_ENTRY.size * len(blocks)
+    index = []
+    for block in blocks:
+        index.append(INDEX_ENTRY.pack(offset, len(block)))
+        offset += len(block)
+
+    tmp = dst + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(HEADER.pack(MAGIC, channels, sampwidth, rate, len(pcm), BLOCK_FRAMES, len(blocks)))
+        f.write(b"".join(index))
+        f.write(b"".join(blocks))
+    os.replace(tmp, dst)
+    return os.path.getsize(src), os.path.getsize(dst)
+
+
+def wav_files(folder):
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            if name.endswith(".wav"):
+                yield os.path.join(root, name)
+
+
+def encode_folder(folder, delete=False, force=False):
+    total_wav = total_packed = 0
+    for src in wav_files(folder):
+        dst = os.path.splitext(src)[0] + EXT
+        if not force and os.path.exists(dst) and os.path.getmtime(dst) >= os.path.getmtime(src):
+            wav_size, packed_size = os.path.getsize(src), os.path.getsize(dst)
+        else:
+            wav_size, packed_size = encode_file(src, dst)
+            print(f"Packed: {src} ({packed_size / wav_size:.0%})")
+        total_wav += wav_size
+        total_packed += packed_size
+        if delete:
+            os.remove(src)
+    return total_wav, total_packed
+
+
+# ===== DECODER =====
+def decode_block(data, channels):
+    raw = zlib.decompress(data)
+    order = raw[0]
+    planes = np.frombuffer(raw, np.uint8, offset=1).reshape(2, -1)
+    samples = (planes[0].astype(np.uint16) | (planes[1].astype(np.uint16) << 8)).view(np.int16)
+    samples = samples.reshape(-1, channels)
+    for _ in range(order):
+        samples = np.cumsum(samples, axis=0, dtype=np.int16)
+    return samples.astype("<i2").tobytes()
+
+
+class BlockCache:
+    """LRU of decoded blocks, bounded by total PCM bytes."""
+
+    def __init__(self, max_bytes=CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.blocks = OrderedDict()     # (path, mtime, block) → PCM bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            pcm = self.blocks.get(key)
+            if pcm is None:
+                self.misses += 1
+                return None
+            self.blocks.move_to_end(key)
+            self.hits += 1
+            return pcm
+
+    def put(self, key, pcm):
+        if len(pcm) > self.max_bytes:
+            return
+        with self.lock:
+            old = self.blocks.pop(key, None)
+            if old is not None:
+                self.size -= len(old)
+            self.blocks[key] = pcm
+            self.size += len(pcm)
+            while self.size > self.max_bytes:
+                _, evicted = self.blocks.popitem(last=False)
+                self.size -= len(evicted)
+
+    def invalidate(self, path):
+        with self.lock:
+            for key in [k for k in self.blocks if k[0] == path]:
+                self.size -= len(self.blocks.pop(key))
+
+    def clear(self):
+        with self.lock:
+            self.blocks.clear()
+            self.size = 0
+
+
+CACHE = BlockCache()
+
+
+class PackedReader:
+    """wave.Wave_read look-alike that decodes blocks on demand."""
+
+    def __init__(self, path, cache=CACHE):
+        self.path = path
+        self.cache = cache
+        self.f = open(path, "rb")
+        self.mtime = os.fstat(self.f.fileno()).st_mtime
+        self.bytes_read = 0
+
+        magic, self.channels, self.sampwidth, self.rate, self.nframes, \
+            self.block_frames, nblocks = HEADER.unpack(self.read(HEADER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path}: not a packed sound file")
+        table = self.read(INDEX_ENTRY.size * nblocks)
+        self.index = [INDEX_ENTRY.unpack_from(table, i * INDEX_ENTRY.size) for i in range(nblocks)]
+
+        self.frame_bytes = self.channels * self.sampwidth
+        self.block = 0
+        self.pending = b""
+
+    def read(self, size):
+        data = self.f.read(size)
+        self.bytes_read += len(data)
+        return data
+
+    def getnchannels(self):
+        return self.channels
+
+    def getsampwidth(self):
+        return self.sampwidth
+
+    def getframerate(self):
+        return self.rate
+
+    def getnframes(self):
+        return self.nframes
+
+    def decoded(self, block):
+        key = (self.path, self.mtime, block)
+        pcm = self.cache.get(key) if self.cache is not None else None
+        if pcm is None:
+            offset, length = self.index[block]
+            self.f.seek(offset)
+            pcm = decode_block(self.read(length), self.channels)
+            if self.cache is not None:
+                self.cache.put(key, pcm)
+        return pcm
+
+    def readframes(self, n):
+        want = n * self.frame_bytes
+        while len(self.pending) < want and self.block < len(self.index):
+            self.pending += self.decoded(self.block)
+            self.block += 1
+        data, self.pending = self.pending[:want], self.pending[want:]
+        return data
+
+    def close(self):
+        self.f.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# ===== BENCHMARK =====
+def benchmark(folder, chunk=1024):
+    """Compare reading every clip through wave.readframes vs the packed decoder."""
+    pairs = [(src, os.path.splitext(src)[0] + EXT) for src in wav_files(folder)]
+    pairs = [(src, dst) for src, dst in pairs if os.path.exists(dst)]
+    if not pairs:
+        print("No packed clips found, run: python asset_codec.py encode", folder)
+        return
+
+    def drain(reader):
+        total = 0
+        data = reader.readframes(chunk)
+        while data:
+            total += len(data)
+            data = reader.readframes(chunk)
+        return total
+
+    wav_read = pcm = 0
+    start = time.perf_counter()
+    for src, _ in pairs:
+        with wave.open(src, "rb") as wf:
+            pcm += drain(wf)
+        wav_read += os.path.getsize(src)
+    wav_time = time.perf_counter() - start
+
+    mb = pcm / 1e6
+    print(f"{len(pairs)} clips, {mb:.1f} MB of PCM")
+    print(f"{'wave.readframes':<16} {mb / wav_time:8.1f} MB/s  read {wav_read / 1e6:6.1f} MB")
+
+    CACHE.clear()
+    packed_read = 0
+    start = time.perf_counter()
+    for _, dst in pairs:
+        with PackedReader(dst, None) as r:
+            drain(r)
+            packed_read += r.bytes_read
+    elapsed = time.perf_counter() - start
+    print(f"{'packed (cold)':<16} {mb / elapsed:8.1f} MB/s  read {packed_read / 1e6:6.1f} MB "
+          f"({1 - packed_read / wav_read:.0%} saved)")
+
+    # Replay the clips that fit in the cache, as a hot set of replies would be
+    hot = []
+    budget = CACHE.max_bytes
+    for src, dst in pairs:
+        with wave.open(src, "rb") as wf:
+            size = wf.getnframes() * wf.getnchannels() * wf.getsampwidth()
+        if size > budget:
+            break
+        budget -= size
+        hot.append(dst)
+    for dst in hot:
+        with PackedReader(dst) as r:
+            drain(r)
+
+    hot_pcm = hot_read = 0
+    start = time.perf_counter()
+    for dst in hot:
+        with PackedReader(dst) as r:
+            hot_pcm += drain(r)
+            hot_read += r.bytes_read
+    elapsed = time.perf_counter() - start
+    print(f"{'packed (cached)':<16} {hot_pcm / 1e6 / elapsed:8.1f} MB/s  read {hot_read / 1e3:6.1f} KB "
+          f"for {len(hot)} clips")
+    print(f"cache: {CACHE.size / 1e6:.1f} MB held, {CACHE.hits} hits, {CACHE.misses} misses")
+
+
+if __name__ == "__main__":
+    # Usage: python asset_codec.py encode [folder] [--delete] [--force]
+    #        python asset_codec.py bench [folder]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "bench"
+    args = [a for a in sys.argv[2:] if not a.startswith("--")]
+    folder = args[0] if args else "sounds/"
+
+    if cmd == "encode":
+        wav_size, packed_size = encode_folder(folder, "--delete" in sys.argv, "--force" in sys.argv)
+        if wav_size:
+            print(f"Done! {wav_size / 1e6:.1f} MB → {packed_size / 1e6:.1f} MB "
+                  f"({packed_size / wav_size:.0%})")
+    elif cmd == "bench":
+        benchmark(folder)
+    else:
+        print("Commands: encode [folder] [--delete] [--force], bench [folder]")
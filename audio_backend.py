@@ -0,0 +1,367 @@
+import os
+import sys
+import importlib
+import time
+import wave
+import statistics
+import tempfile
+import threading
+
+# ===== CONFIG =====
+CHUNK = 1024
+BACKEND_ENV = "FURBY_AUDIO_BACKEND"     # force a backend by name, skips probing
+AUDIO_OUT_ENV = "FURBY_AUDIO_OUT"       # output folder for the "file" backend
+AUDIO_OUT_FOLDER = "audio_out/"
+PACKED_EXT = ".fzc"                     # packed clips, see asset_codec.py
+# ==================
+
+
+def packed_path(path):
+    return os.path.splitext(path)[0] + PACKED_EXT
+
+
+def clip_exists(path):
+    return os.path.exists(path) or os.path.exists(packed_path(path))
+
+
+def open_clip(path):
+    """Open a clip for reading, preferring its packed version when there is one."""
+    packed = packed_path(path)
+    if os.path.exists(packed):
+        import asset_codec      # needs numpy, only on devices with packed sounds
+        return asset_codec.PackedReader(packed)
+    return wave.open(path, "rb")
+
+
+class AudioBackend:
+    """Common output interface: open a stream, write PCM bytes, close it."""
+    name = "base"
+
+    def __init__(self):
+        self.params = None
+        self.lock = threading.Lock()
+        self.written = 0            # frames of the current clip handed to write()
+        self.on_progress = None     # play_file's callback, while a clip plays
+
+    def open(self, rate, channels, sampwidth):
+        raise NotImplementedError
+
+    def write(self, data):
+        raise NotImplementedError
+
+    def finish(self):
+        """Called after each clip. Streams stay open so the next clip skips the open cost."""
+        pass
+
+    def close(self):
+        self.params = None
+
+    def terminate(self):
+        """Release everything the backend holds, beyond the open stream."""
+        self.close()
+
+    def played(self):
+        """Frames of the current clip heard so far. Backends that buffer far ahead override this."""
+        return self.written
+
+    def report_progress(self):
+        if self.on_progress is not None:
+            self.on_progress(self.played() / self.params[0])
+
+    def play_file(self, path, chunk=CHUNK, on_progress=None):
+        """Play a WAV (or packed) clip to completion. Clips are serialized per backend.
+
+        on_progress(seconds) is called after each chunk with the playback
+        position, e.g. to keep an animation track in step with the audio.
+        """
+        if not clip_exists(path):
+            print("Missing sound:", path)
+            return
+
+        with self.lock:
+            wf = open_clip(path)
+            try:
+                frame_bytes = wf.getnchannels() * wf.getsampwidth()
+                self.open(wf.getframerate(), wf.getnchannels(), wf.getsampwidth())
+                self.written = 0
+                self.on_progress = on_progress
+                data = wf.readframes(chunk)
+                while data:
+                    self.write(data)
+                    self.written += len(data) // frame_bytes
+                    self.report_progress()
+                    data = wf.readframes(chunk)
+                self.finish()
+            finally:
+                self.on_progress = None
+                wf.close()
+
+
+class PortAudioBackend(AudioBackend):
+    """PyAudio / PortAudio output stream."""
+    name = "portaudio"
+
+    def __init__(self):
+        super().__init__()
+        import pyaudio
+        self.pa = pyaudio.PyAudio()
+        self.stream = None
+
+    def open(self, rate, channels, sampwidth):
+        if self.stream is not None and self.params == (rate, channels, sampwidth):
+            return
+        self.close()
+        self.stream = self.pa.open(
+            format=self.pa.get_format_from_width(sampwidth),
+            channels=channels,
+            rate=rate,
+            output=True
+        )
+        self.params = (rate, channels, sampwidth)
+
+    def write(self, data):
+        self.stream.write(data)
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.stop_stream()
+            self.stream.close()
+            self.stream = None
+        super().close()
+
+    def terminate(self):
+        """Close and release the PortAudio context; the backend is unusable afterwards."""
+        self.close()
+        if self.pa is not None:
+            self.pa.terminate()
+            self.pa = None
+
+
+class PygameBackend(AudioBackend):
+    """pygame.mixer output, fed chunk by chunk through a queued channel."""
+    name = "pygame"
+
+    def __init__(self):
+        super().__init__()
+        import pygame
+        self.pygame = pygame
+        self.channel = None
+
+    def open(self, rate, channels, sampwidth):
+        if self.channel is not None and self.params == (rate, channels, sampwidth):
+            return
+        self.close()
+        self.pygame.mixer.init(frequency=rate, size=-8 * sampwidth, channels=channels)
+        self.channel = self.pygame.mixer.Channel(0)
+        self.params = (rate, channels, sampwidth)
+
+    def write(self, data):
+        sound = self.pygame.mixer.Sound(buffer=data)
+        # Block like a real stream: wait for the queue slot to free up
+        while self.channel.get_queue() is not None:
+            time.sleep(0.001)
+        if self.channel.get_busy():
+            self.channel.queue(sound)
+        else:
+            self.channel.play(sound)
+
+    def finish(self):
+        while self.channel.get_busy():
+            time.sleep(0.005)
+
+    def close(self):
+        if self.channel is not None:
+            self.finish()
+            self.pygame.mixer.quit()
+            self.channel = None
+        super().close()
+
+
+class NullBackend(AudioBackend):
+    """Discards audio. With realtime=True it sleeps for the clip duration."""
+    name = "null"
+
+    def __init__(self, realtime=False):
+        super().__init__()
+        self.realtime = realtime
+        self.bytes_per_second = 0
+
+    def open(self, rate, channels, sampwidth):
+        self.params = (rate, channels, sampwidth)
+        self.bytes_per_second = rate * channels * sampwidth
+
+    def write(self, data):
+        if self.realtime and self.bytes_per_second:
+            time.sleep(len(data) / self.bytes_per_second)
+
+
+class WavFileBackend(AudioBackend):
+    """Writes every played clip to a numbered WAV file, for headless runs."""
+    name = "file"
+
+    def __init__(self, out_folder=None):
+        super().__init__()
+        self.out_folder = out_folder or os.environ.get(AUDIO_OUT_ENV, AUDIO_OUT_FOLDER)
+        os.makedirs(self.out_folder, exist_ok=True)
+        self.wf = None
+        self.written = []
+
+    def open(self, rate, channels, sampwidth):
+        if self.wf is not None:
+            return
+        path = os.path.join(self.out_folder, f"{len(self.written) + 1:04d}.wav")
+        self.wf = wave.open(path, "wb")
+        self.wf.setnchannels(channels)
+        self.wf.setsampwidth(sampwidth)
+        self.wf.setframerate(rate)
+        self.params = (rate, channels, sampwidth)
+        self.written.append(path)
+
+    def write(self, data):
+        self.wf.writeframes(data)
+
+    def finish(self):
+        self.close()
+
+    def close(self):
+        if self.wf is not None:
+            self.wf.close()
+            self.wf = None
+        super().close()
+
+
+BACKENDS = {
+    PortAudioBackend.name: PortAudioBackend,
+    PygameBackend.name: PygameBackend,
+    NullBackend.name: NullBackend,
+    WavFileBackend.name: WavFileBackend,
+}
+
+# Backends that drive a real device and can be picked automatically
+DEVICE_BACKENDS = [PortAudioBackend.name, PygameBackend.name]
+
+# Backends in their own module, imported on first use: name → module
+EXTRA_BACKENDS = {"process": "audio_worker"}
+
+
+def register_backend(cls):
+    BACKENDS[cls.name] = cls
+
+
+# ===== LATENCY PROBE =====
+class ProbeResult:
+    def __init__(self, name, open_ms=None, first_buffer_ms=None, jitter_ms=None, error=None):
+        self.name = name
+        self.open_ms = open_ms
+        self.first_buffer_ms = first_buffer_ms
+        self.jitter_ms = jitter_ms
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def latency_ms(self):
+        return self.open_ms + self.first_buffer_ms
+
+    def __str__(self):
+        if not self.ok:
+            return f"{self.name:<10} unavailable ({self.error})"
+        return (f"{self.name:<10} open={self.open_ms:7.2f}ms  "
+                f"first-buffer={self.first_buffer_ms:7.2f}ms  "
+                f"jitter={self.jitter_ms:6.2f}ms")
+
+
+def probe_backend(name, seconds=0.25, rate=44100, channels=2, sampwidth=2, chunk=CHUNK):
+    """Measure open latency, first-buffer latency and write jitter for one backend."""
+    out_folder = None
+    backend = None
+    try:
+        if name == WavFileBackend.name:
+            out_folder = tempfile.mkdtemp(prefix="furby_probe_")
+            backend = WavFileBackend(out_folder)
+        else:
+            backend = BACKENDS[name]()
+
+        silence = bytes(chunk * channels * sampwidth)
+        writes = max(2, int(seconds * rate / chunk))
+
+        t0 = time.perf_counter()
+        backend.open(rate, channels, sampwidth)
+        t1 = time.perf_counter()
+
+        stamps = []
+        for _ in range(writes):
+            backend.write(silence)
+            stamps.append(time.perf_counter())
+    except Exception as e:
+        return ProbeResult(name, error=f"{type(e).__name__}: {e}")
+    finally:
+        # Probe instances are thrown away; don't leak their device contexts
+        if backend is not None:
+            backend.terminate()
+        if out_folder:
+            for f in os.listdir(out_folder):
+                os.remove(os.path.join(out_folder, f))
+            os.rmdir(out_folder)
+
+    intervals = [b - a for a, b in zip(stamps, stamps[1:])]
+    return ProbeResult(
+        name,
+        open_ms=(t1 - t0) * 1000,
+        first_buffer_ms=(stamps[0] - t1) * 1000,
+        jitter_ms=statistics.pstdev(intervals) * 1000,
+    )
+
+
+def probe_all(names=None):
+    names = names or [name for name in BACKENDS if name not in EXTRA_BACKENDS]
+    return [probe_backend(name) for name in names]
+
+
+def pick_backend(name=None):
+    """Return a backend instance.
+
+    An explicit name (or FURBY_AUDIO_BACKEND) wins. Otherwise every device
+    backend is probed and the one with the lowest open + first-buffer latency
+    is used, falling back to the null sink when no device is available.
+    """
+    name = name or os.environ.get(BACKEND_ENV)
+    if name:
+        if name not in BACKENDS and name in EXTRA_BACKENDS:
+            importlib.import_module(EXTRA_BACKENDS[name])
+        return BACKENDS[name]()
+
+    results = [r for r in probe_all(DEVICE_BACKENDS) if r.ok]
+    if not results:
+        print("[AUDIO] no output device available, using null backend")
+        return NullBackend()
+
+    best = min(results, key=lambda r: r.latency_ms)
+    print(f"[AUDIO] using {best.name} backend ({best.latency_ms:.1f}ms)")
+    return BACKENDS[best.name]()
+
+
+if __name__ == "__main__":
+    # Usage: python audio_backend.py probe
+    #        python audio_backend.py play <file.wav> [backend]
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "probe"
+
+    if cmd == "probe":
+        results = probe_all()
+        for r in results:
+            print(r)
+        device = [r for r in results if r.ok and r.name in DEVICE_BACKENDS]
+        if device:
+            print("Fastest:", min(device, key=lambda r: r.latency_ms).name)
+        else:
+            print("Fastest: none (no output device), null backend will be used")
+
+    elif cmd == "play":
+        backend = pick_backend(sys.argv[3] if len(sys.argv) > 3 else None)
+        backend.play_file(sys.argv[2])
+        backend.terminate()
+
+    else:
+        print("Commands: probe, play <file.wav> [backend]")
@@ -0,0 +1,416 @@
+import os
+import sys
+import time
+import struct
+import atexit
+import threading
+import statistics
+import multiprocessing as mp
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import audio_backend
+
+# ===== CONFIG =====
+RING_BYTES = 256 * 1024         # ~1.5s of 44.1kHz 16-bit stereo
+CHUNK_BYTES = 4096              # what the worker hands the device per write
+WORKER_BACKEND_ENV = "FURBY_AUDIO_WORKER_BACKEND"   # device backend inside the worker
+# ==================
+#
+# Ring layout in shared memory: a 64-byte header, then RING_BYTES of PCM.
+# Single producer (the FSM process) and single consumer (the worker):
+# only the producer moves write_pos and only the consumer moves read_pos,
+# so no lock is needed. Both are running byte counts; position in the
+# ring is count % RING_BYTES.
+
+HEADER_BYTES = 64
+WRITE_POS = 0
+READ_POS = 8
+POS = struct.Struct("<Q")
+
+
+class Ring:
+    def __init__(self, shm, capacity):
+        self.buf = shm.buf
+        self.capacity = capacity
+
+    def get(self, field):
+        return POS.unpack_from(self.buf, field)[0]
+
+    def set(self, field, value):
+        POS.pack_into(self.buf, field, value)
+
+    def free(self):
+        return self.capacity - (self.get(WRITE_POS) - self.get(READ_POS))
+
+    def used(self):
+        return self.get(WRITE_POS) - self.get(READ_POS)
+
+    def put(self, data):
+        """Copy data in at write_pos; caller checks free() first."""
+        pos = self.get(WRITE_POS)
+        start = pos % self.capacity
+        first = min(len(data), self.capacity - start)
+        self.buf[HEADER_BYTES + start:HEADER_BYTES + start + first] = data[:first]
+        if first < len(data):
+            self.buf[HEADER_BYTES:HEADER_BYTES + len(data) - first] = data[first:]
+        self.set(WRITE_POS, pos + len(data))
+
+    def take(self, size):
+        pos = self.get(READ_POS)
+        start = pos % self.capacity
+        first = min(size, self.capacity - start)
+        data = bytes(self.buf[HEADER_BYTES + start:HEADER_BYTES + start + first])
+        if first < size:
+            data += bytes(self.buf[HEADER_BYTES:HEADER_BYTES + size - first])
+        self.set(READ_POS, pos + size)
+        return data
+
+    def discard(self):
+        self.set(READ_POS, self.get(WRITE_POS))
+
+
+def apply_gain(data, gain):
+    """Scale 16-bit PCM by gain, clipping at full scale. Runs on every chunk while fading."""
+    samples = np.frombuffer(data, "<i2").astype(np.float32) * gain
+    return np.clip(samples, -32768, 32767).astype("<i2").tobytes()
+
+
+# ===== WORKER PROCESS =====
+class SimulatedDevice(audio_backend.NullBackend):
+    """Stand-in for a sound card: consumes audio in real time from a small buffer.
+
+    A write that arrives after the buffer ran dry is counted as an underrun,
+    the audible click we are trying to avoid.
+    """
+    name = "simulated"
+    BUFFER_S = 0.05
+
+    def __init__(self):
+        super().__init__(realtime=False)
+        self.due = None             # when the queued audio runs out
+        self.underruns = 0
+        self.first_write = None
+
+    def open(self, rate, channels, sampwidth):
+        super().open(rate, channels, sampwidth)
+        self.due = None
+
+    def write(self, data):
+        now = time.perf_counter()
+        if self.first_write is None:
+            self.first_write = now
+        if self.due is not None and now > self.due:
+            self.underruns += 1
+        self.due = max(self.due or now, now) + len(data) / self.bytes_per_second
+        # Block like a device: only BUFFER_S of audio may be queued ahead
+        ahead = self.due - time.perf_counter() - self.BUFFER_S
+        if ahead > 0:
+            time.sleep(ahead)
+
+    def finish(self):
+        self.due = None
+
+
+def make_device(name):
+    if name == SimulatedDevice.name:
+        return SimulatedDevice()
+    # FURBY_AUDIO_BACKEND=process brought us here; pick a real device instead
+    os.environ.pop(audio_backend.BACKEND_ENV, None)
+    return audio_backend.pick_backend(name)
+
+
+def worker_main(shm_name, capacity, conn, backend_name):
+    """Audio process: drain the ring into the device, obey commands from conn."""
+    shm = shared_memory.SharedMemory(name=shm_name)
+    ring = Ring(shm, capacity)
+    device = make_device(backend_name)
+    conn.send("ready")
+
+    frame_bytes = 4
+    gain = 1.0
+    fade = None             # (start_time, seconds, start_gain)
+    active = False          # between "mark" and "end": producer still sending
+    mark = None             # (ring position, producer timestamp) of the clip start
+    latencies = []
+    underruns = 0
+    starved = False
+
+    while True:
+        # Idle: block on the command pipe, no polling
+        timeout = 0.002 if active or ring.used() else None
+        if conn.poll(timeout):
+            cmd, *args = conn.recv()
+            if cmd == "open":
+                rate, channels, sampwidth = args
+                frame_bytes = channels * sampwidth
+                try:
+                    device.open(rate, channels, sampwidth)
+                except Exception as e:
+                    print(f"[AUDIO] worker could not open {device.name}: {e}")
+            elif cmd == "mark":
+                mark = tuple(args)
+                active = True
+                starved = False
+                fade = None
+            elif cmd == "end":
+                active = False
+            elif cmd == "stop":
+                ring.discard()
+                fade = None
+            elif cmd == "fade":
+                fade = (time.perf_counter(), args[0], gain)
+            elif cmd == "gain":
+                gain = args[0]
+            elif cmd == "close":
+                device.close()
+            elif cmd == "stats":
+                conn.send({
+                    "latency_ms": [x * 1000 for x in latencies],
+                    "underruns": underruns + getattr(device, "underruns", 0),
+                })
+            elif cmd == "quit":
+                break
+            continue
+
+        used = ring.used()
+        if not used:
+            if active and mark is None and not starved:
+                underruns += 1      # producer fell behind mid-clip
+                starved = True
+            if not active:
+                device.finish()
+            continue
+        starved = False
+
+        size = min(used, CHUNK_BYTES)
+        size -= size % frame_bytes
+        if not size:
+            continue
+        start = ring.get(READ_POS)
+        data = ring.take(size)
+
+        level = gain
+        if fade is not None:
+            begun, seconds, from_gain = fade
+            left = 1 - (time.perf_counter() - begun) / seconds
+            if left <= 0:
+                ring.discard()
+                fade = None
+                continue
+            level = from_gain * left
+        if level != 1.0:
+            data = apply_gain(data, level)
+
+        try:
+            device.write(data)
+        except Exception as e:
+            # Lose the clip, not the worker: the producer is waiting on the ring
+            print(f"[AUDIO] worker device write failed: {e}")
+            ring.discard()
+            mark = None
+            continue
+        if mark is not None and start >= mark[0]:
+            latencies.append(time.perf_counter() - mark[1])
+            mark = None
+
+    device.close()
+    del ring
+    shm.close()
+
+
+# ===== PARENT SIDE =====
+class ProcessBackend(audio_backend.AudioBackend):
+    """Audio output in a child process, fed through a shared-memory ring.
+
+    play_file() in the FSM process only copies PCM into the ring, so GIL
+    contention from handlers and watchers cannot starve the device writes.
+    """
+    name = "process"
+
+    def __init__(self, device=None, capacity=RING_BYTES):
+        super().__init__()
+        ctx = mp.get_context("spawn")
+        self.shm = shared_memory.SharedMemory(create=True, size=HEADER_BYTES + capacity)
+        self.shm.buf[:HEADER_BYTES] = bytes(HEADER_BYTES)
+        self.ring = Ring(self.shm, capacity)
+        self.conn, child_conn = ctx.Pipe()
+        self.conn_lock = threading.Lock()
+        self.process = ctx.Process(
+            target=worker_main,
+            args=(self.shm.name, capacity, child_conn,
+                  device or os.environ.get(WORKER_BACKEND_ENV)),
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()      # ours only, so a dead worker shows up as EOF/broken pipe
+        # Wait out interpreter start-up here rather than on the first clip
+        self.conn.recv()
+        self.marked = False
+        self.clip_start = 0         # ring position of the current clip's first byte
+        self.dropping = False
+        self.drop_after = None
+        atexit.register(self.shutdown)
+
+    def send(self, *cmd):
+        with self.conn_lock:
+            try:
+                self.conn.send(cmd)
+            except OSError:
+                pass        # worker gone; write() drops the clip once the ring is full
+
+    # ---- AudioBackend ----
+    def open(self, rate, channels, sampwidth):
+        # Called at the start of every clip
+        self.dropping = False
+        self.drop_after = None
+        self.marked = False
+        if self.params != (rate, channels, sampwidth):
+            self.params = (rate, channels, sampwidth)
+            self.send("open", rate, channels, sampwidth)
+
+    def write(self, data):
+        if self.dropping or (self.drop_after and time.perf_counter() > self.drop_after):
+            return
+        if not self.marked:
+            self.clip_start = self.ring.get(WRITE_POS)
+            self.send("mark", self.clip_start, time.perf_counter())
+            self.marked = True
+
+        view = memoryview(data)
+        while view:
+            free = self.ring.free()
+            if not free:
+                if not self.process.is_alive():
+                    print("[AUDIO] worker process is gone, dropping clip")
+                    self.dropping = True
+                    return
+                time.sleep(0.002)
+                continue
+            n = min(free, len(view))
+            self.ring.put(view[:n])
+            view = view[n:]
+
+    def finish(self):
+        self.send("end")
+        # The ring holds up to RING_BYTES of audio; keep progress moving while it plays out
+        while self.ring.used() and self.process.is_alive():
+            self.report_progress()
+            time.sleep(0.005)
+        self.report_progress()
+
+    def played(self):
+        # What the worker has taken from the ring, not what we have put in
+        if not self.marked:
+            return 0
+        frame_bytes = self.params[1] * self.params[2]
+        return min(self.written, max(0, self.ring.get(READ_POS) - self.clip_start) // frame_bytes)
+
+    def close(self):
+        if self.process.is_alive():
+            self.send("close")
+        super().close()
+
+    # ---- Controls ----
+    def stop(self):
+        self.dropping = True
+        self.send("stop")
+
+    def fade(self, seconds):
+        self.drop_after = time.perf_counter() + seconds
+        self.send("fade", seconds)
+
+    def set_gain(self, gain):
+        self.send("gain", gain)
+
+    def stats(self):
+        with self.conn_lock:
+            self.conn.send(("stats",))
+            return self.conn.recv()
+
+    def terminate(self):
+        self.close()
+        self.shutdown()
+
+    def shutdown(self):
+        if self.shm is None:
+            return
+        atexit.unregister(self.shutdown)
+        if self.process.is_alive():
+            self.send("quit")
+            self.process.join(2)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.ring = None        # drop our views of the buffer before closing it
+        shm, self.shm = self.shm, None
+        shm.close()
+        try:
+            shm.unlink()
+        except FileNotFoundError:
+            pass
+
+
+audio_backend.register_backend(ProcessBackend)
+
+
+# ===== BENCHMARK =====
+def contention(stop):
+    """GIL-heavy busy work standing in for watchers and print-heavy handlers."""
+    with open(os.devnull, "w") as devnull:
+        n = 0
+        while not stop.is_set():
+            n = sum(i * i for i in range(2000))
+            print("[BUSY]", n, file=devnull)
+
+
+def benchmark(clips, busy_threads=4):
+    stop = threading.Event()
+    threads = [threading.Thread(target=contention, args=(stop,), daemon=True)
+               for _ in range(busy_threads)]
+    for t in threads:
+        t.start()
+
+    results = {}
+
+    # In-process: device writes happen on the playing thread
+    device = SimulatedDevice()
+    latencies = []
+    for path in clips:
+        device.first_write = None
+        start = time.perf_counter()
+        device.play_file(path)
+        latencies.append((device.first_write - start) * 1000)
+    results["in-process"] = (latencies, device.underruns)
+
+    # Out-of-process: the FSM side only fills the ring
+    backend = ProcessBackend(device=SimulatedDevice.name)
+    for path in clips:
+        backend.play_file(path)
+    stats = backend.stats()
+    backend.shutdown()
+    results["worker"] = (stats["latency_ms"], stats["underruns"])
+
+    stop.set()
+    for t in threads:
+        t.join()
+    return results
+
+
+if __name__ == "__main__":
+    # Usage: python audio_worker.py [clip.wav ...]
+    clips = sys.argv[1:] or [
+        os.path.join("sounds", f"{name}.wav")
+        for name in ("bye1", "laugh1", "hungry1", "love_reply1", "random1")
+    ]
+    clips = [c for c in clips if audio_backend.clip_exists(c)]
+    total = 0
+    for c in clips:
+        with audio_backend.open_clip(c) as wf:
+            total += wf.getnframes() / wf.getframerate()
+    print(f"Playing {len(clips)} clips ({total:.1f}s) under GIL contention...")
+
+    print(f"{'path':<12} {'latency p50':>12} {'p99':>8} {'underruns':>10}")
+    for label, (latencies, underruns) in benchmark(clips).items():
+        p99 = sorted(latencies)[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(f"{label:<12} {statistics.median(latencies):>10.2f}ms {p99:>6.2f}ms {underruns:>10}")
@@ -0,0 +1,203 @@
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+import audio_backend
+import clip_meta
+import envelope
+
+# ===== CONFIG =====
+HOP_MS = 20             # one fingerprint frame per 20ms
+WINDOW_MS = 40
+BANDS = 24              # log-spaced bands between LOW_HZ and HIGH_HZ
+LOW_HZ = 100
+HIGH_HZ = 8000
+SILENCE_DB = 45         # frames this far below the clip's loudest are trimmed off the ends
+PREFILTER = 0.9         # summary cosine a pair needs before it is aligned
+MIN_LENGTH_RATIO = 0.5  # shorter / longer clip, below this they are never duplicates
+THRESHOLD = 0.8         # aligned similarity at which two clips count as the same
+WORKERS = os.cpu_count() or 4
+# ==================
+#
+# A fingerprint is the matrix of log band energies (frames × BANDS) with the
+# silent head and tail trimmed. Band edges are in Hz, so 44.1 and 48kHz
+# takes of the same line produce comparable fingerprints. Two clips are
+# compared by sliding the shorter over the longer and taking the best
+# Pearson correlation, scaled by how much of the longer clip is covered.
+# numpy releases the GIL in the FFTs and products, so a thread pool is
+# enough to spread the work over all cores.
+
+
+class Fingerprint:
+    def __init__(self, key, frames, seconds):
+        self.key = key
+        self.seconds = seconds
+        # z-normalized over the whole clip, so loudness differences don't matter
+        self.frames = (frames - frames.mean()) / (frames.std() or 1)
+        profile = np.concatenate([frames.mean(axis=0), frames.std(axis=0)])
+        profile -= profile.mean()
+        self.summary = profile / (np.linalg.norm(profile) or 1)
+
+    @property
+    def folder(self):
+        return os.path.dirname(self.key)
+
+
+def band_energies(pcm, channels, rate):
+    """16-bit PCM bytes → (frames, BANDS) log energies, silence trimmed."""
+    samples = np.frombuffer(pcm, "<i2").reshape(-1, channels).astype(np.float32).mean(axis=1) / 32768
+    hop = rate * HOP_MS // 1000
+    window = rate * WINDOW_MS // 1000
+    if len(samples) < window:
+        samples = np.pad(samples, (0, window - len(samples)))
+
+    frames = sliding_window_view(samples, window)[::hop] * np.hanning(window)
+    power = np.abs(np.fft.rfft(frames, axis=1)) ** 2
+
+    freqs = np.fft.rfftfreq(window, 1 / rate)
+    edges = np.geomspace(LOW_HZ, HIGH_HZ, BANDS + 1)
+    band = np.digitize(freqs, edges) - 1
+    energies = np.zeros((len(frames), BANDS), np.float32)
+    for b in range(BANDS):
+        mask = band == b
+        if mask.any():
+            energies[:, b] = power[:, mask].sum(axis=1)
+    db = 10 * np.log10(energies + 1e-10)
+
+    loud = np.flatnonzero(db.max(axis=1) > db.max() - SILENCE_DB)
+    if len(loud):
+        db = db[loud[0]:loud[-1] + 1]
+    return db
+
+
+def fingerprint(path, folder):
+    wf = audio_backend.open_clip(path)
+    try:
+        if wf.getsampwidth() != 2:
+            print(f"Skipped: {path} (only 16-bit PCM is supported)")
+            return None
+        frames = band_energies(wf.readframes(wf.getnframes()), wf.getnchannels(), wf.getframerate())
+    finally:
+        wf.close()
+    return Fingerprint(clip_meta.clip_key(path, folder), frames, len(frames) * HOP_MS / 1000)
+
+
+def similarity(a, b):
+    """Best aligned correlation of two fingerprints, times the share of the longer one covered."""
+    short, long = (a, b) if len(a.frames) <= len(b.frames) else (b, a)
+    s, l = short.frames, long.frames
+    n = len(s)
+    windows = sliding_window_view(l, n, axis=0)         # (lags, BANDS, n)
+    w = windows - windows.mean(axis=(1, 2), keepdims=True)
+    w_norm = np.sqrt((w ** 2).sum(axis=(1, 2)))
+    s = (s - s.mean()).T
+    corr = np.einsum("lbn,bn->l", w, s) / (w_norm * np.sqrt((s ** 2).sum()) + 1e-9)
+    return float(corr.max()) * (n / len(l))
+
+
+def candidate_pairs(prints):
+    """All pairs whose summary profiles and lengths are close enough to be worth aligning."""
+    summaries = np.stack([p.summary for p in prints])
+    cosine = summaries @ summaries.T
+    lengths = np.array([len(p.frames) for p in prints])
+    ratio = np.minimum.outer(lengths, lengths) / np.maximum.outer(lengths, lengths)
+    i, j = np.nonzero(np.triu((cosine >= PREFILTER) & (ratio >= MIN_LENGTH_RATIO), k=1))
+    return list(zip(i.tolist(), j.tolist())), len(prints) * (len(prints) - 1) // 2
+
+
+def clusters(prints, scores, threshold=THRESHOLD):
+    """Union-find over pairs scoring at least threshold → lists of indices."""
+    parent = list(range(len(prints)))
+
+    def root(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for (i, j), score in scores.items():
+        if score >= threshold:
+            parent[root(i)] = root(j)
+
+    groups = {}
+    for i in range(len(prints)):
+        groups.setdefault(root(i), []).append(i)
+    return [g for g in groups.values() if len(g) > 1]
+
+
+def canonical(prints, members):
+    """Keep the longest take (near-duplicates are usually trims of it), then the lowest name."""
+    return min(members, key=lambda i: (-prints[i].seconds, len(prints[i].key), prints[i].key))
+
+
+def build_aliases(prints, groups):
+    """alias key → canonical key. Only within one folder, where catalog names are relative."""
+    aliases = {}
+    for members in groups:
+        by_folder = {}
+        for i in members:
+            by_folder.setdefault(prints[i].folder, []).append(i)
+        for same_folder in by_folder.values():
+            keep = canonical(prints, same_folder)
+            for i in same_folder:
+                if i != keep:
+                    aliases[prints[i].key] = prints[keep].key
+    return aliases
+
+
+def analyse(folder=clip_meta.SOUND_FOLDER, threshold=THRESHOLD, workers=WORKERS):
+    # Mood variants are renders of other clips, not takes of their own
+    variants = clip_meta.VARIANT_FOLDER + "/"
+    paths = [p for p in envelope.clip_sources(folder)
+             if not clip_meta.clip_key(p, folder).startswith(variants)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        prints = [p for p in pool.map(lambda path: fingerprint(path, folder), paths) if p is not None]
+        fp_time = time.perf_counter() - start
+
+        pairs, total = candidate_pairs(prints)
+        start = time.perf_counter()
+        results = pool.map(lambda pair: similarity(prints[pair[0]], prints[pair[1]]), pairs)
+        scores = dict(zip(pairs, results))
+        cmp_time = time.perf_counter() - start
+
+    print(f"{len(prints)} clips fingerprinted in {fp_time:.2f}s, "
+          f"{len(pairs)} of {total} pairs aligned in {cmp_time:.2f}s ({workers} workers)")
+    return prints, scores, clusters(prints, scores, threshold)
+
+
+def report(prints, scores, groups):
+    for members in sorted(groups, key=lambda g: prints[canonical(prints, g)].key):
+        keep = canonical(prints, members)
+        print(f"\n{prints[keep].key} ({prints[keep].seconds:.2f}s)")
+        for i in sorted(members, key=lambda i: prints[i].key):
+            if i == keep:
+                continue
+            score = scores.get((min(i, keep), max(i, keep)))
+            shown = f"{score:.3f}" if score is not None else "linked"
+            print(f"  {prints[i].key:<24} {prints[i].seconds:6.2f}s  similarity {shown}")
+
+
+if __name__ == "__main__":
+    # Usage: python clip_dedupe.py [folder] [--threshold=0.8] [--write]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    folder = args[0] if args else clip_meta.SOUND_FOLDER
+    threshold = THRESHOLD
+    for a in sys.argv[1:]:
+        if a.startswith("--threshold="):
+            threshold = float(a.split("=", 1)[1])
+
+    prints, scores, groups = analyse(folder, threshold)
+    report(prints, scores, groups)
+    aliases = build_aliases(prints, groups)
+    print(f"\n{len(groups)} clusters, {len(aliases)} duplicate clips")
+
+    if "--write" in sys.argv:
+        meta = clip_meta.load(folder)
+        meta["aliases"] = aliases
+        clip_meta.save(meta, folder)
+        print(f"Aliases written to {clip_meta.meta_path(folder)}")
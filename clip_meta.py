@@ -0,0 +1,48 @@
+import os
+import json
+
+# ===== CONFIG =====
+SOUND_FOLDER = "sounds/"
+META_FILE = "clips.json"    # inside SOUND_FOLDER, written by the offline tools
+VARIANT_FOLDER = "variants" # inside SOUND_FOLDER, mood variants from mood_variants.py
+# ==================
+#
+# Per-clip metadata computed offline so the device never has to analyse
+# audio at runtime. Keys are clip paths relative to the sound folder,
+# without extension ("bye1", "clock/intro3"):
+#
+#   {"clips": {"bye1": {"rate": 44100, "frames": 98170,
+#                       "envelope_ms": 10, "envelope": "<base64>"}},
+#    "aliases": {"bye7": "bye3"}}
+#
+# aliases maps a duplicate clip onto the take the catalog keeps instead
+# (clip_dedupe.py). A clip with rendered mood variants lists them under
+# "variants" (mood_variants.py).
+
+
+def meta_path(folder=SOUND_FOLDER):
+    return os.path.join(folder, META_FILE)
+
+
+def clip_key(path, folder=SOUND_FOLDER):
+    rel = os.path.relpath(os.path.splitext(path)[0], folder)
+    return rel.replace(os.sep, "/")
+
+
+def load(folder=SOUND_FOLDER):
+    try:
+        with open(meta_path(folder)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"clips": {}}
+    except (OSError, ValueError) as e:
+        print(f"[META] could not load {meta_path(folder)}: {e}")
+        return {"clips": {}}
+
+
+def save(meta, folder=SOUND_FOLDER):
+    path = meta_path(folder)
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(meta, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
@@ -2,47 +2,37 @@ import datetime
 import time
 import os
 import random
-import wave
-import pyaudio
+import audio_backend
 
 SOUND_FOLDER = "sounds/clock/"
 STYLES = ["A", "B"]
-# Add as many intro wav names as you have
-FUNNY_INTROS = [
-    "intro1", "intro2", "intro3", "intro4", "intro5",
-    "intro6", "intro7", "intro8", "intro9"]
 
 
-def play(name):
-    """Play WAV file using PyAudio."""
-    filename = os.path.join(SOUND_FOLDER, f"{name}.wav")
+def clip_names(prefix):
+    """Clips in SOUND_FOLDER named prefix + number, WAV or packed (see asset_codec.py)."""
+    if not os.path.isdir(SOUND_FOLDER):
+        return []
+    return sorted({
+        os.path.splitext(f)[0] for f in os.listdir(SOUND_FOLDER)
+        if f.startswith(prefix) and f.endswith((".wav", audio_backend.PACKED_EXT))
+    })
 
-    if not os.path.exists(filename):
-        print("Missing sound:", filename)
-        return
 
-    wf = wave.open(filename, "rb")
-    pa = pyaudio.PyAudio()
+# Every introN clip in the folder; main.py keeps this list in step with the
+# folder while it runs (see main.apply_sound_change)
+FUNNY_INTROS = clip_names("intro")
 
-    # Open audio stream based on WAV file properties
-    stream = pa.open(
-        format=pa.get_format_from_width(wf.getsampwidth()),
-        channels=wf.getnchannels(),
-        rate=wf.getframerate(),
-        output=True
-    )
 
-    # Read and play audio data
-    data = wf.readframes(1024)
-    while data:
-        stream.write(data)
-        data = wf.readframes(1024)
+audio = None    # picked on the first play(), so importing does not probe devices
 
-    # Cleanup
-    stream.stop_stream()
-    stream.close()
-    pa.terminate()
-    wf.close()
+
+def play(name):
+    """Play WAV file through the selected audio backend."""
+    global audio
+    if audio is None:
+        audio = audio_backend.pick_backend()
+    filename = os.path.join(SOUND_FOLDER, f"{name}.wav")
+    audio.play_file(filename)
 
 
 def speak_time():
@@ -55,9 +45,10 @@ def speak_time():
     # ------------------------------
     # 1) PLAY RANDOM FUNNY INTRO
     # ------------------------------
-    intro = random.choice(FUNNY_INTROS)
-    print("Intro:", intro)
-    play(intro)
+    if FUNNY_INTROS:
+        intro = random.choice(FUNNY_INTROS)
+        print("Intro:", intro)
+        play(intro)
 
     style = random.choice(STYLES)
     print("Using style:", style)
@@ -1,51 +1,26 @@
 import datetime
 import os
-import wave
-import pyaudio
 import random
+import audio_backend
+from clock import clip_names
 
 SOUND_FOLDER = "sounds/clock/"
 
-# Intro WAV files
-INTROS = [
-    "dateintro1", "dateintro2", "dateintro3", "dateintro4",
-    "dateintro5", "dateintro6", "dateintro7", "dateintro8"
-]
+# Every dateintroN / dateoutroN clip in the folder, kept in step by main.py
+INTROS = clip_names("dateintro")
+OUTROS = clip_names("dateoutro")
 
-# Outro WAV files
-OUTROS = [
-    "dateoutro1", "dateoutro2", "dateoutro3", "dateoutro4",
-    "dateoutro5", "dateoutro6", "dateoutro7", "dateoutro8"
-]
+
+audio = None    # picked on the first play(), so importing does not probe devices
 
 
 def play(name):
-    """Play WAV file using PyAudio."""
+    """Play WAV file through the selected audio backend."""
+    global audio
+    if audio is None:
+        audio = audio_backend.pick_backend()
     filename = os.path.join(SOUND_FOLDER, f"{name}.wav")
-
-    if not os.path.exists(filename):
-        print("Missing sound:", filename)
-        return
-
-    wf = wave.open(filename, "rb")
-    pa = pyaudio.PyAudio()
-
-    stream = pa.open(
-        format=pa.get_format_from_width(wf.getsampwidth()),
-        channels=wf.getnchannels(),
-        rate=wf.getframerate(),
-        output=True
-    )
-
-    data = wf.readframes(1024)
-    while data:
-        stream.write(data)
-        data = wf.readframes(1024)
-
-    stream.stop_stream()
-    stream.close()
-    pa.terminate()
-    wf.close()
+    audio.play_file(filename)
 
 
 def speak_year(year):
@@ -79,7 +54,8 @@ def speak_date():
     # ------------------------------
     # 1. RANDOM INTRO
     # ------------------------------
-    play(random.choice(INTROS))
+    if INTROS:
+        play(random.choice(INTROS))
 
     # ------------------------------
     # 2. FULL DATE
@@ -96,7 +72,8 @@ def speak_date():
     # ------------------------------
     # 3. RANDOM OUTRO
     # ------------------------------
-    play(random.choice(OUTROS))
+    if OUTROS:
+        play(random.choice(OUTROS))
 
 
 if __name__ == "__main__":
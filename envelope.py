@@ -0,0 +1,87 @@
+import os
+import sys
+import base64
+
+import numpy as np
+
+import audio_backend
+import clip_meta
+
+# ===== CONFIG =====
+STEP_MS = 10        # one envelope byte per 10ms of audio
+RANGE_DB = 40       # loudness range mapped onto full mouth travel, below the clip's peak
+FLOOR_DB = -60      # steps quieter than this (dBFS) are silence, whatever the clip's peak
+# ==================
+
+
+def compute_envelope(pcm, channels, rate, step_ms=STEP_MS):
+    """16-bit PCM bytes → one byte (0-255) of loudness per step_ms."""
+    samples = np.frombuffer(pcm, "<i2").reshape(-1, channels).astype(np.float32).mean(axis=1)
+    window = max(1, rate * step_ms // 1000)
+    steps = -(-len(samples) // window)
+    samples = np.pad(samples, (0, steps * window - len(samples)))
+
+    rms = np.sqrt(np.mean((samples.reshape(steps, window) / 32768) ** 2, axis=1))
+    db = 20 * np.log10(np.maximum(rms, 1e-9))
+    level = np.clip((db - (db.max() - RANGE_DB)) / RANGE_DB, 0, 1)
+    # Relative scaling alone would open the mouth wide for an all-silent clip
+    level[db < FLOOR_DB] = 0
+    return (level * 255).round().astype(np.uint8).tobytes()
+
+
+def clip_sources(folder):
+    """Every clip under folder once, as its .wav path (open_clip picks the packed twin)."""
+    seen = set()
+    for root, _, files in os.walk(folder):
+        for name in sorted(files):
+            base, ext = os.path.splitext(name)
+            if ext in (".wav", audio_backend.PACKED_EXT) and (root, base) not in seen:
+                seen.add((root, base))
+                yield os.path.join(root, base + ".wav")
+
+
+def source_mtime(path):
+    return max(os.path.getmtime(p) for p in (path, audio_backend.packed_path(path)) if os.path.exists(p))
+
+
+def analyse_folder(folder=clip_meta.SOUND_FOLDER, force=False):
+    meta = clip_meta.load(folder)
+    clips = meta.setdefault("clips", {})
+    updated = 0
+
+    for path in clip_sources(folder):
+        key = clip_meta.clip_key(path, folder)
+        entry = clips.setdefault(key, {})
+        mtime = source_mtime(path)
+        if not force and entry.get("envelope") and entry.get("source_mtime", 0) >= mtime:
+            continue
+
+        wf = audio_backend.open_clip(path)
+        try:
+            if wf.getsampwidth() != 2:
+                print(f"Skipped: {path} (only 16-bit PCM is supported)")
+                continue
+            frames = wf.getnframes()
+            env = compute_envelope(wf.readframes(frames), wf.getnchannels(), wf.getframerate())
+            entry.update({
+                "rate": wf.getframerate(),
+                "frames": frames,
+                "source_mtime": mtime,
+                "envelope_ms": STEP_MS,
+                "envelope": base64.b64encode(env).decode(),
+            })
+        finally:
+            wf.close()
+        updated += 1
+        print(f"Envelope: {key} ({len(env)} steps)")
+
+    clip_meta.save(meta, folder)
+    return updated
+
+
+if __name__ == "__main__":
+    # Usage: python envelope.py [folder] [--force]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    folder = args[0] if args else clip_meta.SOUND_FOLDER
+    updated = analyse_folder(folder, "--force" in sys.argv)
+    print(f"Done! {updated} envelopes updated in {clip_meta.meta_path(folder)}")
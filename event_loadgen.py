@@ -0,0 +1,69 @@
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+
+from event_server import SOCKET_ENV, SOCKET_PATH, parse_address
+
+
+def connect(address):
+    family, target = parse_address(address)
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.connect(target)
+    return sock
+
+
+def read_reply(f):
+    while True:
+        msg = json.loads(f.readline())
+        if "received" in msg:
+            return msg
+        if "error" in msg:
+            print("[LOADGEN] server error:", msg["error"])
+
+
+def run(address, count, batch, event):
+    sock = connect(address)
+    f = sock.makefile("r")
+
+    def stats():
+        sock.sendall(b'{"stats": true}\n')
+        return read_reply(f)
+
+    before = stats()
+
+    line = (json.dumps([{"event": event}] * batch) + "\n").encode()
+    batches = max(1, count // batch)
+
+    start = time.perf_counter()
+    for _ in range(batches):
+        sock.sendall(line)
+    sent = time.perf_counter() - start
+
+    # The server handles lines in order, so this reply means every batch was posted
+    after = stats()
+    elapsed = time.perf_counter() - start
+    sock.close()
+
+    posted = after["posted"] - before["posted"]
+    rejected = after["rejected"] - before["rejected"]
+    print(f"[LOADGEN] {posted} events in {batches} batches of {batch}")
+    print(f"[LOADGEN] send {sent * 1000:.1f}ms, posted in {elapsed * 1000:.1f}ms "
+          f"→ {posted / elapsed:,.0f} events/s, {rejected} rejected")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput test for the Furby event socket")
+    parser.add_argument("--address", default=os.environ.get(SOCKET_ENV, SOCKET_PATH))
+    parser.add_argument("--count", type=int, default=100000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--event", default="wake", help="event name to send (default: wake)")
+    args = parser.parse_args()
+
+    try:
+        run(args.address, args.count, args.batch, args.event)
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"[LOADGEN] no Furby listening on {args.address}")
+        sys.exit(1)
@@ -0,0 +1,253 @@
+import os
+import json
+import socket
+import selectors
+import threading
+from collections import deque
+
+# ===== CONFIG =====
+SOCKET_ENV = "FURBY_SOCKET"         # unix socket path, or host:port for TCP
+SOCKET_PATH = "/tmp/furby.sock"
+MAX_LINE = 1 << 20                  # drop clients that send a longer line
+# ==================
+#
+# Protocol: newline-delimited JSON, one message or a JSON array of
+# messages (a batch) per line.
+#
+#   {"event": "touch_head"}                       sensor event, see main.INPUT_EVENTS
+#   {"event": "feed", "payload": {...}}
+#   {"intent": "TELLTIME", "slots": {...}}        same payload as process_command
+#   {"subscribe": true}                           stream {"state": ..., "from": ...} lines back
+#   {"stats": true}                               reply with received/posted/rejected counts,
+#                                                 plus transitions the FSM refused per state/event
+#
+# Bad messages get an {"error": ...} line back; good ones get no reply.
+
+
+def parse_address(address):
+    """'host:port' → TCP (host, port); anything else is a unix socket path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit() and "/" not in address:
+        return socket.AF_INET, (host or "127.0.0.1", int(port))
+    return socket.AF_UNIX, address
+
+
+def command_error(command):
+    """Why a command payload cannot go to process_command, or None if it can."""
+    if not isinstance(command.get("intent"), str):
+        return "intent must be a string"
+    if not isinstance(command.get("slots", {}), dict):
+        return "slots must be an object"
+    return None
+
+
+class Client:
+    __slots__ = ("sock", "inbuf", "outbuf", "subscribed")
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.inbuf = b""
+        self.outbuf = bytearray()
+        self.subscribed = False
+
+
+class EventServer:
+    """Non-blocking socket server that feeds external events into an FSM."""
+
+    def __init__(self, fsm, address=None):
+        self.fsm = fsm
+        self.address = address or os.environ.get(SOCKET_ENV, SOCKET_PATH)
+        self.family, self.bind_to = parse_address(self.address)
+        self.sel = selectors.DefaultSelector()
+        self.clients = {}
+        self.running = False
+
+        # State changes arrive on FSM threads; queue them and poke the selector
+        self.outbox = deque()
+        self.wake_r, self.wake_w = socket.socketpair()
+        self.wake_r.setblocking(False)
+        self.wake_w.setblocking(False)
+
+        self.received = 0
+        self.posted = 0
+        self.rejected = 0
+
+    # ---- Lifecycle ----
+    def start(self):
+        if self.family == socket.AF_UNIX and os.path.exists(self.bind_to):
+            os.remove(self.bind_to)     # stale socket from a previous run
+
+        self.listener = socket.socket(self.family, socket.SOCK_STREAM)
+        if self.family == socket.AF_INET:
+            self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(self.bind_to)
+        self.listener.listen()
+        self.listener.setblocking(False)
+
+        self.sel.register(self.listener, selectors.EVENT_READ, self.accept)
+        self.sel.register(self.wake_r, selectors.EVENT_READ, self.flush_outbox)
+        self.fsm.listeners.append(self.state_changed)
+
+        self.running = True
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        print(f"[SERVER] listening on {self.address}")
+
+    def stop(self):
+        self.running = False
+        self.poke()
+
+    def serve_forever(self):
+        while self.running:
+            for key, mask in self.sel.select():
+                key.data(key.fileobj, mask)
+
+        self.fsm.listeners.remove(self.state_changed)
+        for sock in list(self.clients):
+            self.drop(sock)
+        self.sel.close()
+        self.listener.close()
+        if self.family == socket.AF_UNIX and os.path.exists(self.bind_to):
+            os.remove(self.bind_to)
+
+    def poke(self):
+        try:
+            self.wake_w.send(b"\0")
+        except BlockingIOError:
+            pass    # selector is already due to wake up
+
+    # ---- Connections ----
+    def accept(self, listener, mask):
+        sock, _ = listener.accept()
+        sock.setblocking(False)
+        self.clients[sock] = Client(sock)
+        self.sel.register(sock, selectors.EVENT_READ, self.service)
+
+    def drop(self, sock):
+        self.clients.pop(sock, None)
+        self.sel.unregister(sock)
+        sock.close()
+
+    def service(self, sock, mask):
+        client = self.clients.get(sock)
+        if client is None:
+            return      # dropped earlier in this select round
+        if mask & selectors.EVENT_WRITE:
+            self.write(client)
+        if mask & selectors.EVENT_READ:
+            self.read(client)
+
+    def read(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(client.sock)
+            return
+
+        lines = (client.inbuf + data).split(b"\n")
+        client.inbuf = lines.pop()
+        if len(client.inbuf) > MAX_LINE:
+            self.drop(client.sock)
+            return
+
+        for line in lines:
+            if line.strip():
+                self.handle_line(client, line)
+
+    def write(self, client):
+        try:
+            sent = client.sock.send(client.outbuf)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            self.drop(client.sock)
+            return
+        del client.outbuf[:sent]
+        if not client.outbuf:
+            self.sel.modify(client.sock, selectors.EVENT_READ, self.service)
+
+    def send(self, client, msg):
+        if client.sock not in self.clients:
+            return
+        if not client.outbuf:
+            self.sel.modify(client.sock, selectors.EVENT_READ | selectors.EVENT_WRITE, self.service)
+        client.outbuf += json.dumps(msg).encode() + b"\n"
+
+    # ---- Messages ----
+    def handle_line(self, client, line):
+        try:
+            msg = json.loads(line)
+        except ValueError as e:
+            self.rejected += 1
+            self.send(client, {"error": f"bad json: {e}"})
+            return
+
+        for item in (msg if isinstance(msg, list) else [msg]):
+            self.received += 1
+            error = self.handle_message(client, item)
+            if error:
+                self.rejected += 1
+                self.send(client, {"error": error, "message": item})
+
+    def handle_message(self, client, msg):
+        if not isinstance(msg, dict):
+            return "message must be an object"
+
+        if "event" in msg:
+            payload = msg.get("payload")
+            if payload is not None and not isinstance(payload, dict):
+                return "payload must be an object"
+            if msg["event"] == "command":
+                error = command_error(payload or {})
+                if error:
+                    return error
+            if not isinstance(msg["event"], str) or not self.fsm.inject(msg["event"], payload):
+                return f"unknown event {msg['event']!r}"
+            self.posted += 1
+
+        elif "intent" in msg:
+            command = {"intent": msg["intent"], "slots": msg.get("slots") or {}}
+            error = command_error(command)
+            if error:
+                return error
+            self.fsm.inject("command", command)
+            self.posted += 1
+
+        elif msg.get("subscribe"):
+            client.subscribed = True
+            self.send(client, {"state": self.fsm.state.name})
+
+        elif msg.get("stats"):
+            self.send(client, {
+                "received": self.received,
+                "posted": self.posted,
+                "rejected": self.rejected,
+                # dict() copies in one step, the dispatch thread may be counting
+                "transitions_rejected": {
+                    f"{state.name}/{event}": n for (state, event), n in dict(self.fsm.rejected).items()
+                },
+            })
+
+        else:
+            return "expected one of event, intent, subscribe, stats"
+
+    # ---- State streaming ----
+    def state_changed(self, old, new):
+        self.outbox.append({"state": new.name, "from": old.name})
+        self.poke()
+
+    def flush_outbox(self, sock, mask):
+        try:
+            while sock.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+        while self.outbox:
+            msg = self.outbox.popleft()
+            for client in list(self.clients.values()):
+                if client.subscribed:
+                    self.send(client, msg)
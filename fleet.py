@@ -0,0 +1,242 @@
+import os
+import sys
+import time
+import heapq
+import itertools
+import threading
+import statistics
+import tracemalloc
+from array import array
+from contextlib import redirect_stdout
+from concurrent.futures import ThreadPoolExecutor
+
+import audio_backend
+import main
+from main import FurbyFSM, Event, Priority, State
+
+# ===== CONFIG =====
+WORKERS = 4
+WATCH_INTERVAL = 5      # seconds between watcher passes, same as the standalone watchers
+DRAIN_BATCH = 8         # events one instance may handle before yielding its worker
+BENCH_LOCK = 0.05       # wake-up/snore locks during the benchmark, so instances reach IDLE quickly
+# ==================
+
+
+class Timer:
+    __slots__ = ("when", "fn", "args", "cancelled")
+
+    def __init__(self, when, fn, args):
+        self.when = when
+        self.fn = fn
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Scheduler:
+    """One thread and a heap of timers; due callbacks run on the executor."""
+
+    def __init__(self, executor):
+        self.executor = executor
+        self.heap = []              # (when, seq, Timer)
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def call_later(self, delay, fn, *args):
+        timer = Timer(time.monotonic() + delay, fn, args)
+        with self.cond:
+            heapq.heappush(self.heap, (timer.when, next(self.seq), timer))
+            if self.heap[0][2] is timer:
+                self.cond.notify()
+        return timer
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+        self.thread.join()
+
+    def run(self):
+        with self.cond:
+            while self.running:
+                if not self.heap:
+                    self.cond.wait()
+                    continue
+                delay = self.heap[0][0] - time.monotonic()
+                if delay > 0:
+                    self.cond.wait(delay)
+                    continue
+                _, _, timer = heapq.heappop(self.heap)
+                if not timer.cancelled:
+                    self.executor.submit(timer.fn, *timer.args)
+
+
+class FleetRuntime:
+    """Runs many FurbyFSM instances on one scheduler and a small worker pool.
+
+    Each instance keeps its events in a plain heap. Posting to an idle
+    instance submits it to the pool once; a worker then drains up to
+    DRAIN_BATCH events before yielding, so busy instances cannot starve
+    the rest.
+    """
+
+    def __init__(self, workers=WORKERS, audio=None, watch_interval=WATCH_INTERVAL):
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fleet")
+        self.scheduler = Scheduler(self.executor)
+        self.audio = audio or audio_backend.NullBackend()
+        self.watch_interval = watch_interval
+        self.instances = []
+        self.lock = threading.Lock()
+        self.idle = threading.Condition(self.lock)
+        self.pending = 0
+        self.latencies = array("d")     # post → dispatch, seconds
+        self.handled = 0                # dispatched and not ignored (locked) or rejected
+        self.errors = 0                 # drain batches that died outside dispatch
+        self.scheduler.call_later(watch_interval, self.tick)
+
+    def spawn(self, count=1):
+        new = [FurbyFSM(runtime=self) for _ in range(count)]
+        self.instances.extend(new)
+        return new
+
+    # ---- Dispatch ----
+    def post(self, fsm, item):
+        with self.lock:
+            heapq.heappush(fsm.event_q, item)
+            self.pending += 1
+            if fsm.scheduled:
+                return
+            fsm.scheduled = True
+        self.submit(fsm)
+
+    def submit(self, fsm):
+        try:
+            self.executor.submit(self.drain, fsm)
+        except RuntimeError:
+            # Executor shut down by stop(); leave the instance unscheduled
+            with self.lock:
+                fsm.scheduled = False
+
+    def drain(self, fsm):
+        try:
+            for _ in range(DRAIN_BATCH):
+                with self.lock:
+                    if not fsm.event_q:
+                        fsm.scheduled = False
+                        return
+                    _, _, ev = heapq.heappop(fsm.event_q)
+
+                self.latencies.append(time.perf_counter() - ev.created)
+                handled = fsm.dispatch(ev)      # logs and swallows handler errors itself
+                with self.lock:
+                    self.handled += bool(handled)
+                    self.pending -= 1
+                    if not self.pending:
+                        self.idle.notify_all()
+        except BaseException:
+            # Unscheduled, so the next post() submits the instance again
+            with self.lock:
+                fsm.scheduled = False
+                self.errors += 1
+            raise
+
+        # Batch used up: go to the back of the pool queue
+        self.submit(fsm)
+
+    def wait_idle(self, timeout=None):
+        """Block until every posted event has been dispatched."""
+        with self.lock:
+            return self.idle.wait_for(lambda: self.pending == 0, timeout)
+
+    # ---- Watchers ----
+    def tick(self):
+        for fsm in self.instances:
+            if fsm.running:
+                fsm.watch_tick()
+        self.scheduler.call_later(self.watch_interval, self.tick)
+
+    def stop(self):
+        for fsm in self.instances:
+            fsm.stop()
+        self.scheduler.stop()
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+
+# ===== BENCHMARK =====
+def percentile(values, p):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def benchmark(count, events_per_instance=5, workers=WORKERS):
+    """Spawn `count` instances, then post a burst of touch events to all of them.
+
+    Locks are shortened to BENCH_LOCK and the burst starts once every
+    instance is IDLE, so the touch handlers really run. Latency is post →
+    dispatch, so under a burst it includes queueing behind the other
+    instances' events.
+    """
+    threads_before = threading.active_count()
+    devnull = open(os.devnull, "w")
+    locks = main.WAKEUP_LOCK, main.NORMAL_LOCK, main.SNORE_LOCK, main.LISTENING_LOCK
+    main.WAKEUP_LOCK = main.NORMAL_LOCK = main.SNORE_LOCK = main.LISTENING_LOCK = BENCH_LOCK
+
+    with redirect_stdout(devnull):
+        tracemalloc.start()
+        before = tracemalloc.get_traced_memory()[0]
+        runtime = FleetRuntime(workers)
+        runtime.spawn(count)
+        memory = tracemalloc.get_traced_memory()[0] - before
+        tracemalloc.stop()
+
+        for fsm in runtime.instances:
+            fsm.wait_for_state(State.IDLE)
+        while any(fsm.locked() for fsm in runtime.instances):
+            time.sleep(BENCH_LOCK)
+        runtime.wait_idle()
+        del runtime.latencies[:]
+        runtime.handled = 0
+
+        start = time.perf_counter()
+        for _ in range(events_per_instance):
+            for fsm in runtime.instances:
+                fsm.post(Event(Priority.TOUCH.value, "touch_head"))
+        runtime.wait_idle()
+        elapsed = time.perf_counter() - start
+
+        threads = threading.active_count() - threads_before
+        runtime.stop()
+    devnull.close()
+    main.WAKEUP_LOCK, main.NORMAL_LOCK, main.SNORE_LOCK, main.LISTENING_LOCK = locks
+
+    latencies = [x * 1000 for x in runtime.latencies]
+
+    return {
+        "instances": count,
+        "threads": threads,
+        "bytes_per_instance": memory / count,
+        "events_per_sec": len(latencies) / elapsed,
+        "handled": runtime.handled,
+        "dispatched": len(latencies),
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": percentile(latencies, 0.99),
+    }
+
+
+if __name__ == "__main__":
+    # Usage: python fleet.py [count ...]
+    os.environ.setdefault(audio_backend.BACKEND_ENV, "null")
+    counts = [int(c) for c in sys.argv[1:]] or [10, 1000, 10000]
+
+    print(f"{'instances':>10} {'threads':>8} {'KB/inst':>8} {'events/s':>10} {'handled':>10} "
+          f"{'p50 ms':>8} {'p99 ms':>8}")
+    for count in counts:
+        r = benchmark(count)
+        print(f"{r['instances']:>10} {r['threads']:>8} {r['bytes_per_instance'] / 1024:>8.2f} "
+              f"{r['events_per_sec']:>10.0f} {r['handled']:>4}/{r['dispatched']:<5} "
+              f"{r['p50_ms']:>8.2f} {r['p99_ms']:>8.2f}")
@@ -3,50 +3,96 @@ import time
 import threading
 import queue
 import json
-import os, random
+import os, sys
+from collections import Counter, namedtuple
 from enum import Enum, auto
+import audio_backend
+import alarms
+import policy
+import event_server
+import sound_watcher
+import clip_meta
+import animation
+import clock
+import date
 SOUND_FOLDER = "sounds/"
-
-def get_sound_list(prefix):
-    if not os.path.exists(SOUND_FOLDER):
+CLOCK_FOLDER = "sounds/clock/"
+
+# Offline analysis per clip (mouth envelopes, duplicate aliases), see envelope.py
+# and clip_dedupe.py
+CLIP_INFO = clip_meta.load(SOUND_FOLDER)
+CLIP_META = CLIP_INFO["clips"]
+CLIP_ALIASES = CLIP_INFO.get("aliases", {})
+
+def canonical_clip(name, folder=SOUND_FOLDER):
+    """Name of the clip that stands in for name, which is itself unless it is a known duplicate."""
+    target = CLIP_ALIASES.get(clip_meta.clip_key(os.path.join(folder, name), SOUND_FOLDER))
+    if target is None:
+        return name
+    return clip_meta.clip_key(os.path.join(SOUND_FOLDER, target), folder)
+
+def get_sound_list(prefix, folder=SOUND_FOLDER):
+    if not os.path.exists(folder):
         print("Missing sound folder!")
         return []
-    else 
-        return [
-            f.replace(".wav", "")
-            for f in os.listdir(SOUND_FOLDER)
-            if f.startswith(prefix) and f.endswith(".wav")
-        ]
+    else:
+        # A clip may be a WAV or its packed version (see asset_codec.py), or both
+        # Duplicates collapse onto one clip, so each unique take is listed once
+        names = {
+            canonical_clip(os.path.splitext(f)[0], folder)
+            for f in os.listdir(folder)
+            if f.startswith(prefix) and f.endswith((".wav", audio_backend.PACKED_EXT))
+        }
+        return sorted(names)
     
 # Initialize audio files data.
-SOUND_SNEEZE = get_sound_list("sneeze")
-SOUND_COUGH = get_sound_list("cough")
-SOUND_SICK = get_sound_list("sick")
-
-SOUND_SNORING = get_sound_list("snoring")
-SOUND_LOVE = get_sound_list("love_reply")
-SOUND_LAUGH = get_sound_list("laugh")
-SOUND_HUNGRY = get_sound_list("hungry")
-SOUND_HOWAREYOU = get_sound_list("howareyou_reply")
-SOUND_HATE_REPLY = get_sound_list("hate_reply")
-SOUND_BYE = get_sound_list("bye")
-SOUND_GREETING_MORNING = get_sound_list("greeting_morning")
-SOUND_GREETING_AFTERNOON = get_sound_list("greeting_afternoon")
-SOUND_GREETING_EVENING = get_sound_list("greeting_evening")
-SOUND_GREETING_NIGHT = get_sound_list("greeting_night")
-SOUND_RANDOM = get_sound_list("random")
+SOUND_CATEGORIES = [
+    "sneeze", "cough", "sick", "snoring", "love_reply", "laugh", "hungry",
+    "howareyou_reply", "hate_reply", "bye", "greeting_morning",
+    "greeting_afternoon", "greeting_evening", "greeting_night", "random",
+]
+SOUND_CATALOG = {category: get_sound_list(category) for category in SOUND_CATEGORIES}
+
+def mood_variant(sound, mood):
+    """Clip to play for sound in a mood: its rendered variant if there is one (mood_variants.py)."""
+    return CLIP_META.get(sound, {}).get("variants", {}).get(mood, sound)
+
+def mood_clips(mood, categories):
+    """Clips of categories that have a rendered variant for mood."""
+    return [name for category in categories for name in SOUND_CATALOG[category]
+            if mood_variant(name, mood) != name]
+
+# Mood behaviors: random clips voiced for the mood, placeholders until rendered
+SOUND_CATALOG["sad"] = mood_clips("sad", ["random"]) or ["sigh", "slow_blink"]
+SOUND_CATALOG["angry"] = mood_clips("angry", ["random"]) or ["grr", "shake_head"]
+
+SOUND_SNEEZE = SOUND_CATALOG["sneeze"]
+SOUND_COUGH = SOUND_CATALOG["cough"]
+SOUND_SICK = SOUND_CATALOG["sick"]
+
+SOUND_SNORING = SOUND_CATALOG["snoring"]
+SOUND_LOVE = SOUND_CATALOG["love_reply"]
+SOUND_LAUGH = SOUND_CATALOG["laugh"]
+SOUND_HUNGRY = SOUND_CATALOG["hungry"]
+SOUND_HOWAREYOU = SOUND_CATALOG["howareyou_reply"]
+SOUND_HATE_REPLY = SOUND_CATALOG["hate_reply"]
+SOUND_BYE = SOUND_CATALOG["bye"]
+SOUND_GREETING_MORNING = SOUND_CATALOG["greeting_morning"]
+SOUND_GREETING_AFTERNOON = SOUND_CATALOG["greeting_afternoon"]
+SOUND_GREETING_EVENING = SOUND_CATALOG["greeting_evening"]
+SOUND_GREETING_NIGHT = SOUND_CATALOG["greeting_night"]
+SOUND_RANDOM = SOUND_CATALOG["random"]
+
+# Talking clock clips with numbered variants
+# The very lists clock.py and date.py pick their intros and outros from, so
+# apply_sound_change updates what they play
+CLOCK_CATALOG = {"intro": clock.FUNNY_INTROS, "dateintro": date.INTROS, "dateoutro": date.OUTROS}
+for category, names in CLOCK_CATALOG.items():
+    names[:] = get_sound_list(category, CLOCK_FOLDER)     # in place, duplicates collapsed
 
 def get_time_greeting():
-    hour = time.localtime().tm_hour
-
-    if 5 <= hour < 12:
-        return random.choice(SOUND_GREETING_MORNING)
-    elif 12 <= hour < 17:
-        return random.choice(SOUND_GREETING_AFTERNOON)
-    elif 17 <= hour < 21:
-        return random.choice(SOUND_GREETING_EVENING)
-    else:
-        return random.choice(SOUND_GREETING_NIGHT)
+    band = policy.time_band(time.localtime().tm_hour)
+    return POLICY.pick(("greeting", band))
 
 
 # ===== CONFIG =====
@@ -56,6 +102,11 @@ IDLE_TIMEOUT = 30
 SNORE_LOCK = 5
 LISTENING_LOCK = 5
 NORMAL_LOCK = 5
+HUNGER_TICK = 60            # hunger drops HUNGER_DECAY every HUNGER_TICK awake seconds
+HUNGER_DECAY = 10
+MOOD_RELAX_AFTER = 120      # awake seconds without interaction before mood relaxes to HAPPY
+WAKEWORD_BACKOFF_MIN = 0.05 # wait after a miss, doubling up to WAKEWORD_BACKOFF_MAX
+WAKEWORD_BACKOFF_MAX = 1.0
 # ==================
 
 class State(Enum):
@@ -77,65 +128,358 @@ class Priority(Enum):
     TOUCH = 2
     FEED = 1
     WAKEWORD = 0
+    ALARM = -1
+    INTERNAL = -2       # continuations and timed hunger/mood events; pass the input lock
+
+# ===== BEHAVIOR POLICY =====
+# Categories a random behavior draws from, per hunger band and mood.
+# Hunger overrides mood.
+HUNGER_BEHAVIORS = {
+    policy.STARVING: ["sneeze", "cough", "sick"],
+    policy.HUNGRY: ["hungry"],
+}
+MOOD_BEHAVIORS = {
+    Mood.HAPPY: ["random"],
+    Mood.SAD: ["sad"],
+    Mood.ANGRY: ["angry"],
+}
+
+def build_policy():
+    p = policy.BehaviorPolicy(SOUND_CATALOG)
+    for band in policy.TIME_BANDS:
+        p.define(("greeting", band), [f"greeting_{band}"])
+        for hunger in policy.HUNGER_BANDS:
+            for mood in Mood:
+                p.define((mood, hunger, band), HUNGER_BEHAVIORS.get(hunger, MOOD_BEHAVIORS[mood]))
+    p.define(("snoring",), ["snoring"])
+    return p
+
+POLICY = build_policy()
+
+# ===== HOT RELOAD =====
+# clips.json fields that describe one take of a clip (see envelope.py)
+ENVELOPE_FIELDS = ("rate", "frames", "source_mtime", "envelope_ms", "envelope")
+
+def sound_category(name):
+    """'love_reply11' → 'love_reply': numbered clips share their category."""
+    return name.rstrip("0123456789")
+
+def refresh_clip_meta(path):
+    """Re-read path's clips.json entry; keep only what still matches the changed file."""
+    key = clip_meta.clip_key(path, SOUND_FOLDER)
+    entry = clip_meta.load(SOUND_FOLDER)["clips"].get(key)
+    if entry is None:
+        CLIP_META.pop(key, None)
+        return
+    try:
+        stale = entry.get("source_mtime", 0) < os.path.getmtime(path)
+    except OSError:
+        stale = True
+    if stale:
+        # Envelope is of the old take; variants are still worth playing
+        entry = {k: v for k, v in entry.items() if k not in ENVELOPE_FIELDS}
+        print(f"[RELOAD] {key}: envelope out of date, run envelope.py to redo it")
+    else:
+        print(f"[RELOAD] {key}: envelope reloaded")
+    CLIP_META[key] = entry
+
+def apply_sound_change(kind, folder, filename):
+    """Apply one file change from the sound watcher to the catalog and caches."""
+    name = os.path.splitext(filename)[0]
+    path = os.path.join(folder, filename)
+
+    # Drop stale decoded blocks of a packed clip
+    codec = sys.modules.get("asset_codec")
+    if codec is not None and filename.endswith(audio_backend.PACKED_EXT):
+        codec.CACHE.invalidate(path)
+
+    if kind == "modify":
+        print(f"[RELOAD] {path} changed")
+        # Only the file open_clip reads carries the envelope: the packed twin
+        # when there is one, else the WAV
+        if filename.endswith(audio_backend.PACKED_EXT) or not os.path.exists(
+                audio_backend.packed_path(path)):
+            refresh_clip_meta(path)
+        return
+
+    if os.path.normpath(folder) == os.path.normpath(CLOCK_FOLDER):
+        catalog, behavior = CLOCK_CATALOG, None
+    else:
+        catalog, behavior = SOUND_CATALOG, POLICY
+
+    category = sound_category(name)
+    name = canonical_clip(name, folder)
+    names = catalog.get(category)
+    if names is None:
+        print(f"[RELOAD] ignoring {path}: no category {category!r}")
+        return
+
+    if kind == "add" and name not in names:
+        names[:] = sorted(names + [name])   # in place: SOUND_* aliases see it
+    elif kind == "remove" and name in names:
+        if audio_backend.clip_exists(os.path.join(folder, name + ".wav")):
+            return      # the WAV or packed twin is still there
+        names[:] = [n for n in names if n != name]
+    else:
+        return
+
+    if behavior is not None:
+        behavior.update_category(category)
+    print(f"[RELOAD] {category}: {len(names)} clips")
+
+# External inputs (console, event socket): name → (priority, FSM event)
+INPUT_EVENTS = {
+    "wake": (Priority.GENERIC, "wake"),
+    "touch_head": (Priority.TOUCH, "touch_head"),
+    "touch_belly": (Priority.TOUCH, "touch_belly"),
+    "feed": (Priority.FEED, "feed"),
+    "tilt": (Priority.TOUCH, "tilt"),
+    "shake": (Priority.TOUCH, "shake"),
+    "dance": (Priority.TOUCH, "dance"),
+    "wakeword": (Priority.WAKEWORD, "wakeword"),
+    "command": (Priority.GENERIC, "command"),    # payload: {"intent": ..., "slots": {...}}
+}
+
+# ===== TRANSITIONS =====
+# Every event the FSM accepts, per state, and the state it leads to (None:
+# stay). An event with no row for the current state is rejected and
+# counted. Entering a state runs FurbyFSM.enter_<state>, if there is one.
+# woke, snored, listened and sung are posted by the FSM itself when a
+# timed step is over.
+AWAKE = (State.WAKEUP, State.IDLE, State.LISTENING, State.BUSY)
+NOT_SLEEPING = (State.START, State.SNORING) + AWAKE
+ALL_STATES = tuple(State)
+
+TRANSITIONS = [
+    # event          from                              to
+    ("start",        (State.START,),                   State.WAKEUP),
+    ("woke",         (State.WAKEUP,),                  State.IDLE),
+    ("wake",         (State.SLEEPING,),                State.WAKEUP),
+    ("alarm_fired",  (State.SLEEPING, State.SNORING),  State.WAKEUP),
+    ("alarm_fired",  (State.START,) + AWAKE,           None),
+    ("touch_head",   (State.SLEEPING,),                State.WAKEUP),
+    ("touch_head",   NOT_SLEEPING,                     None),
+    ("touch_belly",  (State.SLEEPING,),                State.WAKEUP),
+    ("touch_belly",  NOT_SLEEPING,                     None),
+    ("tilt",         (State.SLEEPING,),                State.WAKEUP),
+    ("tilt",         NOT_SLEEPING,                     None),
+    ("shake",        (State.SLEEPING,),                State.WAKEUP),
+    ("shake",        NOT_SLEEPING,                     None),
+    ("feed",         ALL_STATES,                       None),
+    ("dance",        (State.IDLE,),                    None),
+    ("random",       (State.IDLE,),                    None),
+    ("idle_timeout", (State.IDLE,),                    State.SNORING),
+    ("snored",       (State.SNORING,),                 State.SLEEPING),
+    ("wakeword",     (State.IDLE,),                    State.LISTENING),
+    ("wakeword",     (State.SLEEPING,),                State.WAKEUP),
+    ("listened",     (State.LISTENING,),               State.BUSY),
+    ("sing",         (State.IDLE, State.BUSY),         State.BUSY),
+    ("sung",         (State.BUSY,),                    State.IDLE),
+    ("command",      ALL_STATES,                       None),
+    ("hunger_band",  ALL_STATES,                       None),
+    ("mood_relax",   ALL_STATES,                       None),
+]
+
+def compile_transitions(rows):
+    """Rows → {(state, event): target}; a state may list an event only once."""
+    table = {}
+    for event, sources, target in rows:
+        for state in sources:
+            if (state, event) in table:
+                raise ValueError(f"duplicate transition for {event} in {state.name}")
+            table[(state, event)] = target
+    return table
+
+TRANSITION_TABLE = compile_transitions(TRANSITIONS)
+
+# Events whose handler runs before the transition's entry action instead of
+# after it: an alarm rings first, then the wake-up sequence starts.
+HANDLER_FIRST = {"alarm_fired"}
+
+# Published on every transition and never mutated: other threads read
+# fsm.snapshot once and get a consistent view without taking a lock.
+StateSnapshot = namedtuple("StateSnapshot", "state previous event seq at")
 
 class Event:
+    __slots__ = ("priority", "name", "payload", "created")
+
     def __init__(self, priority, name, payload=None):
         self.priority = priority
         self.name = name
         self.payload = payload or {}
+        self.created = time.perf_counter()
 
 class FurbyFSM:
-    def __init__(self):
+    # Slotted so a fleet of thousands of instances stays compact
+    __slots__ = (
+        "runtime", "scheduled", "event_counter", "snapshot", "state_cond", "listeners", "rejected",
+        "event_q", "audio", "actuators",
+        "locked_until", "last_activity", "running", "awake_total", "awake_since",
+        "hunger_base", "hunger_since", "hunger_timer", "_mood", "mood_since", "mood_timer",
+        "alarms",
+    )
+
+    def __init__(self, runtime=None):
+        # runtime: a fleet.FleetRuntime to share its scheduler and workers,
+        # or None to run standalone with dedicated threads
+        self.runtime = runtime
+        self.scheduled = False
         self.event_counter = 0
-        self.state = State.START
-        self.event_q = queue.PriorityQueue()
+        self.listeners = []         # called as listener(old_state, new_state)
+        self.snapshot = StateSnapshot(State.START, None, None, 0, time.monotonic())
+        self.state_cond = threading.Condition()     # notified on every state change
+        self.rejected = Counter()   # (state, event) → times the table refused it
+        self.event_q = [] if runtime else queue.PriorityQueue()
+        self.audio = runtime.audio if runtime else audio_backend.pick_backend()
+        self.actuators = animation.NullOutput() if runtime else animation.PrintOutput()
 
         self.locked_until = 0
         self.last_activity = time.time()
         self.running = True
 
+        # Hunger and mood are derived on read from anchors on the awake
+        # clock (see awake_clock), and threshold crossings are scheduled
+        # as events instead of polled.
+        self.awake_total = 0.0
+        self.awake_since = time.monotonic()
+
         # ===== HUNGER SYSTEM =====
-        self.hunger = 100
-        self.last_hunger_tick = time.time()
+        self.hunger_timer = None
+        self.hunger_base = 100
+        self.hunger_since = 0.0
+        self.schedule_hunger()
 
         # ===== MOOD SYSTEM =====
-        self.mood = Mood.HAPPY      # Default mood
-        self.last_interaction = time.time()
+        self.mood_timer = None
+        self._mood = Mood.HAPPY     # Default mood
+        self.mood_since = 0.0
 
-        # Start main loop
-        threading.Thread(target=self.main_loop, daemon=True).start()
+        # ===== ALARM SYSTEM =====
+        # Fleet instances get no alarm thread or alarm file
+        self.alarms = None if runtime else alarms.AlarmScheduler(self.alarm_due)
 
         # Start wake sequence
         self.post(Event(Priority.GENERIC.value, "start"))
 
+        # In fleet mode the runtime drives dispatch and the watchers
+        if runtime is not None:
+            return
+
+        # Start main loop
+        threading.Thread(target=self.main_loop, daemon=True).start()
+
         # Random behavior system
         threading.Thread(target=self.random_behavior_watch, daemon=True).start()
 
         # Idle timeout watcher
         threading.Thread(target=self.idle_sleep_watch, daemon=True).start()
 
-        # Hunger watcher
-        threading.Thread(target=self.hunger_watch, daemon=True).start()
-        
         #wake word listener
         threading.Thread(target=self.wakeword_listener, daemon=True).start()
 
     # ---- Hardware/action stubs ----
     def play(self, sound):
-        print(f"[PLAY] {sound}")
+        clip = mood_variant(sound, self.mood.name.lower())
+        print(f"[PLAY] {sound}" if clip == sound else f"[PLAY] {sound} ({self.mood.name.lower()})")
+        path = os.path.join(SOUND_FOLDER, f"{clip}.wav")
+        track = animation.AnimationTrack.for_clip(CLIP_META.get(clip), self.actuators)
+        if track is None:
+            self.spawn(self.audio.play_file, path)
+        else:
+            self.spawn(self.play_animated, path, track)
+
+    def play_animated(self, path, track):
+        self.audio.play_file(path, on_progress=track.seek)
+        track.finish()
 
     def anim(self, name, d=1):
         print(f"[ANIM] {name} ({d}s)")
-        time.sleep(d)
+        # Fleet instances have no actuators; never tie up a shared worker
+        if self.runtime is None:
+            time.sleep(d)
 
     # ---- Utility ----   
+    @property
+    def state(self):
+        return self.snapshot.state
+
+    def transition(self, event, before=None):
+        """Apply the TRANSITION_TABLE row for event in the current state.
+
+        Returns False, and counts it, when the state does not accept event.
+        before(), if given, runs once the event is accepted but before the
+        state changes. Only the dispatch thread (dispatch and the handlers
+        it calls) may call this, so state changes need no lock.
+        """
+        state = self.snapshot.state
+        key = (state, event)
+        if key not in TRANSITION_TABLE:
+            self.rejected[key] += 1
+            print(f"[FSM] {event} rejected in {state.name}")
+            return False
+
+        if before is not None:
+            before()
+        target = TRANSITION_TABLE[key]
+        if target is not None and target != state:
+            print(f"[FSM] {state.name} → {target.name}")
+            self.publish(target, event)
+            entry = getattr(self, f"enter_{target.name.lower()}", None)
+            if entry is not None:
+                entry()
+        return True
+
+    def publish(self, new, event):
+        old = self.snapshot
+        snapshot = StateSnapshot(new, old.state, event, old.seq + 1, time.monotonic())
+        with self.state_cond:
+            self.snapshot = snapshot
+            self.state_cond.notify_all()
+        if new == State.SLEEPING:
+            self.enter_low_power()
+        elif old.state == State.SLEEPING:
+            self.leave_low_power()
+        for listener in self.listeners:
+            listener(old.state, new)
+
     #def post(self, ev):
     #    self.event_q.put((ev.priority, time.time(), ev))
 
     def post(self, ev):
         self.event_counter += 1
-        self.event_q.put((ev.priority, self.event_counter, ev))
-    
+        if self.runtime is not None:
+            self.runtime.post(self, (ev.priority, self.event_counter, ev))
+        else:
+            self.event_q.put((ev.priority, self.event_counter, ev))
+
+    def post_internal(self, name):
+        """Continue a timed step: the next transition happens on the dispatch thread."""
+        self.post(Event(Priority.INTERNAL.value, name))
+
+    def inject(self, name, payload=None):
+        """Post an external input event by name. Returns False for unknown names."""
+        entry = INPUT_EVENTS.get(name)
+        if entry is None:
+            return False
+        priority, event = entry
+        self.post(Event(priority.value, event, payload))
+        return True
+
+    def spawn(self, fn, *args):
+        """Run fn in the background: own thread standalone, shared worker in a fleet."""
+        if self.runtime is not None:
+            self.runtime.executor.submit(fn, *args)
+        else:
+            threading.Thread(target=fn, args=args, daemon=True).start()
+
+    def after(self, delay, fn, *args):
+        """Run fn once after delay seconds. Returns a handle with cancel()."""
+        if self.runtime is not None:
+            return self.runtime.scheduler.call_later(delay, fn, *args)
+        timer = threading.Timer(delay, fn, args)
+        timer.daemon = True
+        timer.start()
+        return timer
 
     def lock_for(self, sec):
         self.locked_until = time.time() + sec
@@ -145,75 +489,193 @@ class FurbyFSM:
         return time.time() < self.locked_until
 
     # ---- Watchers ----
+    def check_random_behavior(self):
+        if self.state == State.IDLE:
+            if time.time() - self.last_activity > IDLE_RANDOM_BEHAVIOR_AFTER:
+                self.post(Event(Priority.GENERIC.value, "random"))
+
+    def check_idle_timeout(self):
+        if self.state == State.IDLE:
+            if time.time() - self.last_activity > IDLE_TIMEOUT:
+                self.post(Event(Priority.GENERIC.value, "idle_timeout"))
+
+    def watch_tick(self):
+        """One pass of all periodic watchers; the fleet runtime calls this every 5s."""
+        self.check_random_behavior()
+        self.check_idle_timeout()
+
+    def wait_for_state(self, *states):
+        """Block, without polling, until the FSM is in one of states or stopping."""
+        with self.state_cond:
+            self.state_cond.wait_for(lambda: self.snapshot.state in states or not self.running)
+
     def random_behavior_watch(self):
         while self.running:
-            if self.state == State.IDLE:
-                if time.time() - self.last_activity > IDLE_RANDOM_BEHAVIOR_AFTER:
-                    self.post(Event(Priority.GENERIC.value, "random"))
+            self.wait_for_state(State.IDLE)
+            self.check_random_behavior()
             time.sleep(5)
 
     def idle_sleep_watch(self):
         while self.running:
-            if self.state == State.IDLE:
-                if time.time() - self.last_activity > IDLE_TIMEOUT:
-                    self.post(Event(Priority.GENERIC.value, "idle_timeout"))
+            self.wait_for_state(State.IDLE)
+            self.check_idle_timeout()
             time.sleep(5)
 
-    # ===== HUNGER WATCHER =====
-    def hunger_watch(self):
-        while self.running:
+    # ===== LOW POWER SLEEP =====
+    # While SLEEPING only the wake sources stay armed: sensor events on the
+    # blocking event queue, the alarm thread and the wake word listener.
+    # Watchers park on state_cond, hunger/mood timers are cancelled and the
+    # audio device is released.
+    def enter_low_power(self):
+        self.pause_decay()
+        if self.runtime is None:
+            self.spawn(self.release_audio)
+
+    def leave_low_power(self):
+        self.resume_decay()
+
+    def release_audio(self):
+        # Waits for a clip still playing (the last snore) before closing
+        with self.audio.lock:
             if self.state == State.SLEEPING:
-                time.sleep(5)
-                continue
+                self.audio.close()
+                print("[AUDIO] device released")
+
+    # ===== DERIVED HUNGER & MOOD =====
+    def awake_clock(self):
+        """Seconds spent awake; stands still while SLEEPING."""
+        if self.awake_since is None:
+            return self.awake_total
+        return self.awake_total + time.monotonic() - self.awake_since
+
+    def pause_decay(self):
+        self.awake_total = self.awake_clock()
+        self.awake_since = None
+        for timer in (self.hunger_timer, self.mood_timer):
+            if timer is not None:
+                timer.cancel()
+        self.hunger_timer = self.mood_timer = None
+        print("[HUNGER] paused")
+
+    def resume_decay(self):
+        self.awake_since = time.monotonic()
+        self.schedule_hunger()
+        self.schedule_mood()
+        print("[HUNGER] resumed")
+
+    @property
+    def hunger(self):
+        ticks = int((self.awake_clock() - self.hunger_since) // HUNGER_TICK)
+        return max(0, self.hunger_base - HUNGER_DECAY * ticks)
+
+    @hunger.setter
+    def hunger(self, value):
+        # Re-anchor on the last tick boundary so the next drop keeps its timing
+        now = self.awake_clock()
+        self.hunger_since += (now - self.hunger_since) // HUNGER_TICK * HUNGER_TICK
+        self.hunger_base = value
+        self.schedule_hunger()
+
+    def schedule_hunger(self):
+        """Schedule an event for the next time hunger drops into a lower band."""
+        if self.hunger_timer is not None:
+            self.hunger_timer.cancel()
+            self.hunger_timer = None
+        if self.awake_since is None:
+            return
 
-            if time.time() - self.last_hunger_tick > 60:  # Every 1 min
-                self.hunger = max(0, self.hunger - 10)
-                self.last_hunger_tick = time.time()
-                print(f"[HUNGER] level = {self.hunger}")
+        for threshold in (policy.HUNGRY_BELOW, policy.STARVING_BELOW):
+            if self.hunger_base >= threshold:
+                ticks = (self.hunger_base - threshold) // HUNGER_DECAY + 1
+                due = self.hunger_since + ticks * HUNGER_TICK
+                if due > self.awake_clock():
+                    self.hunger_timer = self.after(
+                        due - self.awake_clock(), self.post_internal, "hunger_band")
+                    return
+
+    def on_hunger_band(self, payload):
+        hunger = self.hunger
+        print(f"[HUNGER] level = {hunger} ({policy.hunger_band(hunger)})")
+        self.schedule_hunger()
+        # React right away instead of waiting for the next random behavior
+        self.post(Event(Priority.GENERIC.value, "random"))
+
+    @property
+    def mood(self):
+        if self._mood != Mood.HAPPY and self.awake_clock() - self.mood_since >= MOOD_RELAX_AFTER:
+            return Mood.HAPPY
+        return self._mood
+
+    def schedule_mood(self):
+        if self.mood_timer is not None:
+            self.mood_timer.cancel()
+            self.mood_timer = None
+        if self.awake_since is None or self._mood == Mood.HAPPY:
+            return
+        delay = max(0, self.mood_since + MOOD_RELAX_AFTER - self.awake_clock())
+        self.mood_timer = self.after(delay, self.post_internal, "mood_relax")
 
-            time.sleep(5)
+    def on_mood_relax(self, payload):
+        if self._mood != Mood.HAPPY and self.mood == Mood.HAPPY:
+            print(f"[MOOD] {self._mood.name} → HAPPY (relaxed)")
+            self._mood = Mood.HAPPY
+        self.mood_timer = None
 
     def wakeword_listener(self):
+        backoff = WAKEWORD_BACKOFF_MIN
         while self.running:
-            # Wake word allowed ONLY in IDLE state
-            if self.state == State.IDLE:
-                detected = self.detect_wakeword()
-                if detected:
-                    print("[WAKEWORD] wake word detected! Listening for command.")
-                    #self.state = State.LISTENING
-                    self.post(Event(Priority.WAKEWORD.value, "listening"))
-                    time.sleep(1)  # prevent spamming
-            else:
-                time.sleep(0.5)
-
-    def on_listening(self, payload):
-        if self.state == State.IDLE:
-            print("[FSM] IDLE → LISTENING")
-            self.state = State.LISTENING
-            self.lock_for(LISTENING_LOCK)
-            self.play("listening")
-            self.anim("listening", LISTENING_LOCK)
-            
-            def on_listening_completed():
-                self.state = State.BUSY
-                self.last_activity = time.time()
-                print("[FSM] LISTENING → BUSY")
-                
-                data = {
-                        "intent": "SINGASONG",
-                        "slots": {
-                            "song": "golden"
-                            }
-                        }
-                self.process_command(data)
-            threading.Thread(target=on_listening_completed, daemon=True).start()
-        else: 
-            print(f"Cannot listen in {self.state} state.")
+            # Wake word listens for commands in IDLE and wakes Furby from SLEEPING
+            self.wait_for_state(State.IDLE, State.SLEEPING)
+            heard = self.detect_wakeword()
+            if heard is None:
+                # No engine: nothing to listen to, so sleep until stop()
+                with self.state_cond:
+                    self.state_cond.wait_for(lambda: not self.running)
+                return
+            if not heard:
+                # A detector that returns at once (polling, or no engine) must
+                # not spin; back off while nothing is heard
+                time.sleep(backoff)
+                backoff = min(backoff * 2, WAKEWORD_BACKOFF_MAX)
+                continue
+
+            backoff = WAKEWORD_BACKOFF_MIN
+            print("[WAKEWORD] wake word detected!")
+            # The transition table picks listening (IDLE) or waking up (SLEEPING)
+            self.post(Event(Priority.WAKEWORD.value, "wakeword"))
+            time.sleep(1)  # prevent spamming
+
+    def enter_listening(self):
+        self.lock_for(LISTENING_LOCK)
+        self.play("listening")
+        self.anim("listening", LISTENING_LOCK)
+        self.post_internal("listened")
+
+    def on_listened(self, payload):
+        self.last_activity = time.time()
+        data = {
+                "intent": "SINGASONG",
+                "slots": {
+                    "song": "golden"
+                    }
+                }
+        self.process_command(data)
+
+    def on_wakeword(self, payload):
+        if self.snapshot.state == State.LISTENING:
+            print("[WAKEWORD] Listening for command.")
+        else:
+            print("[WAKEWORD] Waking up.")
 
     def detect_wakeword(self):
+        """True when the wake word was heard, False when not, None without an engine."""
         # TODO: connect real wake-word engine here
-        # For testing, we simulate random detection:
-        return True
+        # No engine yet: the listener parks. Use the "wakeword" input event
+        # (console or event socket) to simulate one.
+        return None
+
+    def on_command(self, payload):
+        self.process_command(payload)
 
     def process_command(self, data):
         intent =  data["intent"]
@@ -248,7 +710,7 @@ class FurbyFSM:
                 self.on_singrhyme()
 
             case "DANCE":
-                self.on_dance()
+                self.on_dance_intent()
 
             case "ILOVEYOU":
                 self.on_iloveyou()
@@ -342,15 +804,11 @@ class FurbyFSM:
 
     def on_singasong(self, song):
         print(f"[INTENT] Sing a song: {song}")
-        self.state = State.BUSY
+        if not self.transition("sing"):
+            return
         self.play(song)
         self.anim(song, WAKEUP_LOCK)
-        
-        def finish():
-            self.state = State.IDLE
-            self.last_activity = time.time()
-            print("[FSM] BUSY → IDLE")
-        threading.Thread(target=finish, daemon=True).start()
+        self.post_internal("sung")
 
     def on_gotosleep(self):
         print("[INTENT] Go to sleep")
@@ -366,9 +824,13 @@ class FurbyFSM:
 
     def on_telltime(self):
         print("[INTENT] Tell the time")
+        clock.audio = self.audio        # through this FURBY's device
+        clock.speak_time()
 
     def on_telldate(self):
         print("[INTENT] Tell the date")
+        date.audio = self.audio
+        date.speak_date()
 
     def on_playgame(self):
         print("[INTENT] Play a game")
@@ -376,8 +838,10 @@ class FurbyFSM:
     def on_singrhyme(self):
         print("[INTENT] Sing a rhyme / poem")
 
-    def on_dance(self):
+    def on_dance_intent(self):
+        # Not on_dance: that name is the dance sensor event's handler
         print("[INTENT] Dance")
+        self.inject("dance")
 
     def on_iloveyou(self):
         print("[INTENT] I love you")
@@ -432,6 +896,16 @@ class FurbyFSM:
 
     def on_alarm(self, hour, minute, ampm):
         print(f"[INTENT] Alarm set for {hour}:{minute} {ampm}")
+        if self.alarms is None:
+            print("[ALARM] alarms are not available in fleet mode")
+            return
+        try:
+            fire_at = alarms.next_occurrence(hour, minute, ampm)
+        except (TypeError, ValueError) as e:
+            print(f"[ALARM] cannot set alarm: {e}")
+            return
+        alarm = self.alarms.add(fire_at)
+        print(f"[ALARM] set for {alarm.label()}")
 
     def on_playmusic(self):
         print("[INTENT] Play music")
@@ -442,7 +916,7 @@ class FurbyFSM:
     def on_ok(self):
         print("[INTENT] OK")
 
-    def on_yes():
+    def on_yes(self):
         print("[INTENT] YES")
 
     def on_no(self):
@@ -453,9 +927,33 @@ class FurbyFSM:
 
     def on_remove_alarm(self, alarm):
         print(f"[INTENT] Remove alarm {alarm}")
+        if self.alarms is None:
+            print("[ALARM] alarms are not available in fleet mode")
+            return
+        try:
+            removed = self.alarms.remove(alarm)
+        except (TypeError, ValueError):
+            print(f"[ALARM] not an alarm number: {alarm!r}")
+            return
+        if not removed:
+            print(f"[ALARM] no alarm number {alarm}")
+        for a in removed:
+            print(f"[ALARM] removed {a.label()}")
 
     def on_tell_alarm(self):
         print("[INTENT] Tell all alarms")
+        if self.alarms is None:
+            print("[ALARM] alarms are not available in fleet mode")
+            return
+        pending = self.alarms.alarms()
+        if not pending:
+            print("[ALARM] no alarms set")
+        for i, a in enumerate(pending, start=1):
+            print(f"[ALARM] {i}. {a.label()}")
+
+        fired, mean_ms, max_ms = self.alarms.jitter_stats()
+        if fired:
+            print(f"[ALARM] jitter over {fired} alarms: mean {mean_ms:.1f}ms, max {max_ms:.1f}ms")
 
     def on_friend(self):
         print("[INTENT] Friend request")
@@ -467,32 +965,45 @@ class FurbyFSM:
     # ---- MAIN LOOP ----
     def main_loop(self):
         while self.running:
-            try:
-                pr, ts, ev = self.event_q.get(timeout=0.5)
-            except queue.Empty:
-                continue
-
-            if self.locked():
-                print(f"[IGNORE] event {ev.name} (locked)")
-                continue
-
-            handler = getattr(self, f"on_{ev.name}", None)
+            # Blocks until an event arrives; stop() posts a None sentinel
+            pr, ts, ev = self.event_q.get()
+            if ev is None:
+                break
+            self.dispatch(ev)
+
+    def dispatch(self, ev):
+        """Handle one event. Returns False when it was ignored or rejected."""
+        # Alarms and the FSM's own continuations get through a lock
+        if self.locked() and ev.priority > Priority.ALARM.value:
+            print(f"[IGNORE] event {ev.name} (locked)")
+            return False
+
+        # The transition (and its entry action) normally runs first, so
+        # handlers see the state the event leads to
+        handler = getattr(self, f"on_{ev.name}", None)
+        try:
+            if handler and ev.name in HANDLER_FIRST:
+                return self.transition(ev.name, before=lambda: handler(ev.payload))
+            if not self.transition(ev.name):
+                return False
             if handler:
                 handler(ev.payload)
-            else:
-                print(f"[WARN] no handler for {ev.name}")
+        except Exception as e:
+            # A bad event must not take the dispatch loop down with it
+            print(f"[ERROR] {ev.name} failed: {type(e).__name__}: {e}")
+            return False
+        return True
 
     # ---- MOOD SETTERS ----
     def set_mood(self, mood):
         if mood != self.mood:
             print(f"[MOOD] {self.mood.name} → {mood.name}")
-        self.mood = mood
-        self.last_interaction = time.time()
+        self._mood = mood
+        self.mood_since = self.awake_clock()
+        self.schedule_mood()
 
-    # ---- HANDLERS ----
-    def on_start(self, payload):
-        print("[FSM] START → WAKEUP")
-        self.state = State.WAKEUP
+    # ---- STATE ENTRY ACTIONS ----
+    def enter_wakeup(self):
         self.lock_for(WAKEUP_LOCK)
         self.play("yawn")
         self.anim("yawn", WAKEUP_LOCK)
@@ -501,76 +1012,51 @@ class FurbyFSM:
         action = get_time_greeting()
         self.play(action)
         self.anim(action, NORMAL_LOCK)
+        self.after(WAKEUP_LOCK, self.post_internal, "woke")
 
-        def finish():
-            time.sleep(WAKEUP_LOCK)
-            self.state = State.IDLE
-            self.last_activity = time.time()
-            print("[FSM] WAKEUP → IDLE")
-            print("[HUNGER] resumed")
-        threading.Thread(target=finish, daemon=True).start()
+    def enter_idle(self):
+        self.last_activity = time.time()
 
-    def on_idle_timeout(self, payload):
-        print("[FSM] Idle -> Snoring")
-        self.state = State.SNORING
+    def enter_snoring(self):
         self.lock_for(SNORE_LOCK)
-        action = random.choice(SOUND_SNORING)
+        action = POLICY.pick(("snoring",))
         self.play(action)
         self.anim(action, SNORE_LOCK)
-
-        def finishSnoring():
-            self.state = State.SLEEPING
-            print("[FSM] Snoring -> Sleeping")
-        threading.Thread(target=finishSnoring, daemon=True).start()
+        self.post_internal("snored")
 
     # ===== RANDOM BEHAVIOR WITH MOOD =====
     def on_random(self, payload):
-        if self.state != State.IDLE:
+        # Hunger overrides mood; the policy table already encodes that
+        hunger = policy.hunger_band(self.hunger)
+        band = policy.time_band(time.localtime().tm_hour)
+        action = POLICY.pick((self.mood, hunger, band))
+        if action is None:
             return
 
-        # Hunger overrides mood
-        if self.hunger < 20:
-            action = random.choice(SOUND_SNEEZE + SOUND_COUGH + SOUND_SICK)
+        if hunger == policy.STARVING:
             print(f"[STARVING ACTION] {action}")
-            self.play(action)
-            self.anim(action, 3)
-            return
-
-        elif self.hunger < 40:
-            action = random.choice(SOUND_HUNGRY)
+        elif hunger == policy.HUNGRY:
             print(f"[HUNGRY ACTION] {action}")
-            self.play(action)
-            self.anim(action, 3)
-            return
+        #print(f"[RANDOM] ({self.mood.name}) → {action}")
+        self.play(action)
+        self.anim(action, 3)
 
-        # Mood-based behaviors
-        mood_actions = {
-            Mood.HAPPY: SOUND_RANDOM,
-            Mood.SAD: ["sigh", "slow_blink"],
-            Mood.ANGRY: ["grr", "shake_head"],
-        }
+    # ===== ALARMS =====
+    def alarm_due(self, alarm, late):
+        # Called from the alarm thread; hand over to the FSM at top priority
+        self.post(Event(Priority.ALARM.value, "alarm_fired", {"alarm": alarm, "late": late}))
 
-        c = random.choice(mood_actions[self.mood])
-        #print(f"[RANDOM] ({self.mood.name}) → {c}")
-        self.play(c)
-        self.anim(c, 3)
-
-    def on_wake(self, payload):
-        if self.state == State.SLEEPING:
-            print("[FSM] WAKING FROM SLEEP → WAKEUP")
-            self.on_start({})
-        else:
-            print("[INFO] Already awake")
+    def on_alarm_fired(self, payload):
+        alarm = payload["alarm"]
+        print(f"[ALARM] ringing for {alarm.label()} (late {payload['late'] * 1000:.1f}ms)")
+        self.play("alarm")
+        self.anim("alarm", 3)
 
     # ===== MOOD-DRIVEN TOUCH EVENTS =====
     def on_touch_head(self, payload):
         print("[EVENT] head touch")
         self.set_mood(Mood.HAPPY)
 
-        if self.state == State.SLEEPING:
-            self.on_wake({})
-            return
-
         if self.state == State.IDLE:
             self.last_activity = time.time()
             self.play("purr")
@@ -580,10 +1066,6 @@ class FurbyFSM:
         print("[EVENT] belly touch")
         self.set_mood(Mood.HAPPY)
 
-        if self.state == State.SLEEPING:
-            self.on_wake({})
-            return
-
         if self.state == State.IDLE:
             self.last_activity = time.time()
             self.play("giggle")
@@ -604,10 +1086,6 @@ class FurbyFSM:
         print("[EVENT] tilt")
         self.set_mood(Mood.SAD)
 
-        if self.state == State.SLEEPING:
-            self.on_wake({})
-            return
-
         if self.state == State.IDLE:
             self.play("tilt")
             self.anim("tilt", 1)
@@ -617,10 +1095,6 @@ class FurbyFSM:
         print("[EVENT] shake")
         self.set_mood(Mood.ANGRY)
 
-        if self.state == State.SLEEPING:
-            self.on_wake({})
-            return
-
         if self.state == State.IDLE:
             self.play("shake")
             self.anim("shake", 1)
@@ -629,31 +1103,37 @@ class FurbyFSM:
     # ===== DANCE MODE =====
     def on_dance(self, payload):
         print("[EVENT] dance mode!")
-        self.state = State.IDLE
         self.last_activity = time.time()
         self.play("dance")
         self.anim("dance", 10)
 
     def stop(self):
         self.running = False
+        with self.state_cond:
+            self.state_cond.notify_all()
+        if self.alarms is not None:
+            self.alarms.stop()
+        if self.runtime is None:
+            self.event_q.put((float("-inf"), 0, None))
+            self.audio.terminate()
 
 
 # ============================
 #     MANUAL COMMANDS
 # ============================
 
-fsm = FurbyFSM()
-
-def event_wake(): fsm.post(Event(Priority.GENERIC.value, "wake"))
-def event_touch_head(): fsm.post(Event(Priority.TOUCH.value, "touch_head"))
-def event_touch_belly(): fsm.post(Event(Priority.TOUCH.value, "touch_belly"))
-def event_feed(): fsm.post(Event(Priority.FEED.value, "feed"))
-def event_tilt(): fsm.post(Event(Priority.TOUCH.value, "tilt"))
-def event_shshake(): fsm.post(Event(Priority.TOUCH.value, "shake"))
-def event_dance(): fsm.post(Event(Priority.TOUCH.value, "dance"))
-def event_wakeword(): fsm.post(Event(Priority.WAKEWORD.value, "listening"))
+def event_wake(): fsm.inject("wake")
+def event_touch_head(): fsm.inject("touch_head")
+def event_touch_belly(): fsm.inject("touch_belly")
+def event_feed(): fsm.inject("feed")
+def event_tilt(): fsm.inject("tilt")
+def event_shshake(): fsm.inject("shake")
+def event_dance(): fsm.inject("dance")
+def event_wakeword(): fsm.inject("wakeword")
 # ============================
 # CONSOLE INPUT LOOP
+# Only with --console; events normally arrive on the event socket
+# (see event_server.py).
 # ============================
 def console_loop():
     while True:
@@ -671,11 +1151,21 @@ def console_loop():
         else:
             print("Commands: wake, head, belly, feed, tilt, shake, dance")
 
-threading.Thread(target=console_loop, daemon=True).start()
-
-# Keep alive
-try:
-    while True:
-        time.sleep(1)
-except KeyboardInterrupt:
-    fsm.stop()
+if __name__ == "__main__":
+    fsm = FurbyFSM()
+    server = event_server.EventServer(fsm)
+    server.start()
+    watcher = sound_watcher.SoundWatcher([SOUND_FOLDER, CLOCK_FOLDER], apply_sound_change)
+    watcher.start()
+
+    if "--console" in sys.argv:
+        threading.Thread(target=console_loop, daemon=True).start()
+
+    # Keep alive
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()
+        server.stop()
+        fsm.stop()
@@ -0,0 +1,194 @@
+import os
+import sys
+import time
+import wave
+import base64
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import audio_backend
+import clip_meta
+import envelope
+
+# ===== CONFIG =====
+# How each non-happy mood reshapes a line. Keys are main.Mood names, lowercased.
+MOOD_STYLES = {
+    "sad": {"pitch": -2.0, "tempo": 0.85, "gain": 0.7},     # semitones, speed, level
+    "angry": {"pitch": 1.0, "tempo": 1.12, "gain": 1.4},
+}
+VARIANT_CATEGORIES = ["love_reply", "howareyou_reply", "hate_reply", "bye", "laugh", "random"]
+FRAME_MS = 40           # WSOLA frame
+SEEK_MS = 10            # how far WSOLA may slide a frame to keep the waveform continuous
+LIMIT = 0.9             # soft-limit above this level instead of clipping
+WORKERS = os.cpu_count() or 4
+# ==================
+#
+# Variants are rendered offline into sounds/variants/<mood>/<clip>.wav and
+# recorded in clips.json, both on the variant and on its source clip:
+#
+#   "love_reply1": {..., "variants": {"sad": "variants/sad/love_reply1"}}
+#   "variants/sad/love_reply1": {..., "variant_of": "love_reply1", "mood": "sad",
+#                                "style": {...}, "variant_source_mtime": ...}
+#
+# At play time the FSM only looks the variant up; no DSP runs on the device.
+
+
+def resample(x, length):
+    """Band-limited resample of (frames, channels) float audio to length frames."""
+    spectrum = np.fft.rfft(x, axis=0)
+    out = np.zeros((length // 2 + 1, x.shape[1]), spectrum.dtype)
+    keep = min(len(out), len(spectrum))
+    out[:keep] = spectrum[:keep]
+    return np.fft.irfft(out, length, axis=0) * (length / len(x))
+
+
+def time_stretch(x, factor, rate):
+    """WSOLA: make x factor times longer without changing its pitch."""
+    frame = rate * FRAME_MS // 1000
+    hop_out = frame // 2
+    hop_in = hop_out / factor
+    seek = rate * SEEK_MS // 1000
+    if len(x) < frame + 2 * seek:
+        return resample(x, max(1, round(len(x) * factor)))
+
+    mono = x.mean(axis=1)
+    window = np.hanning(frame)
+    frames = int((len(x) - frame) / hop_in) + 1
+    out = np.zeros((frames * hop_out + frame, x.shape[1]))
+    norm = np.zeros(len(out))
+
+    pos = 0
+    for k in range(frames):
+        if k:
+            # Pick the input frame that best continues the one just placed
+            natural = mono[pos + hop_out:pos + hop_out + frame]
+            nominal = int(k * hop_in)
+            lo = max(0, nominal - seek)
+            hi = min(len(x) - frame, nominal + seek)
+            region = mono[lo:hi + frame]
+            if len(natural) == frame and hi > lo:
+                pos = lo + int(np.argmax(np.correlate(region, natural, "valid")))
+            else:
+                pos = min(nominal, len(x) - frame)
+        at = k * hop_out
+        out[at:at + frame] += x[pos:pos + frame] * window[:, None]
+        norm[at:at + frame] += window
+    return out / np.maximum(norm, 1e-3)[:, None]
+
+
+def soft_limit(x):
+    over = np.abs(x) > LIMIT
+    x[over] = np.sign(x[over]) * (LIMIT + (1 - LIMIT) * np.tanh((np.abs(x[over]) - LIMIT) / (1 - LIMIT)))
+    return x
+
+
+def apply_style(pcm, channels, rate, style):
+    """16-bit PCM bytes → PCM bytes with pitch (semitones), tempo and gain applied."""
+    x = np.frombuffer(pcm, "<i2").reshape(-1, channels).astype(np.float64) / 32768
+    shift = 2 ** (style["pitch"] / 12)
+    # Resampling raises the pitch by shift and shortens the clip by the same
+    # factor; the stretch then restores the length the tempo asks for
+    x = resample(x, max(1, round(len(x) / shift)))
+    x = time_stretch(x, shift / style["tempo"], rate)
+    x = soft_limit(x * style["gain"])
+    return (np.clip(x, -1, 1) * 32767).round().astype("<i2").tobytes()
+
+
+def render(src, dst, style):
+    """Worker: render one variant, return its metadata entry."""
+    wf = audio_backend.open_clip(src)
+    try:
+        channels, sampwidth, rate = wf.getnchannels(), wf.getsampwidth(), wf.getframerate()
+        if sampwidth != 2:
+            raise ValueError(f"{src}: only 16-bit PCM is supported")
+        pcm = apply_style(wf.readframes(wf.getnframes()), channels, rate, style)
+    finally:
+        wf.close()
+
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = dst + ".tmp"
+    with wave.open(tmp, "wb") as out:
+        out.setnchannels(channels)
+        out.setsampwidth(sampwidth)
+        out.setframerate(rate)
+        out.writeframes(pcm)
+    os.replace(tmp, dst)
+
+    # Envelope now, while the PCM is at hand, so the mouth follows the variant
+    env = envelope.compute_envelope(pcm, channels, rate)
+    return {
+        "rate": rate,
+        "frames": len(pcm) // (channels * sampwidth),
+        "source_mtime": os.path.getmtime(dst),
+        "envelope_ms": envelope.STEP_MS,
+        "envelope": base64.b64encode(env).decode(),
+    }
+
+
+def variant_key(mood, key):
+    return f"{clip_meta.VARIANT_FOLDER}/{mood}/{key}"
+
+
+def jobs(folder, categories, moods, force):
+    """(source key, mood, src path, dst path, style) for every variant that is missing or stale."""
+    meta = clip_meta.load(folder)["clips"]
+    for path in envelope.clip_sources(folder):
+        key = clip_meta.clip_key(path, folder)
+        if "/" in key or key.rstrip("0123456789") not in categories:
+            continue
+        mtime = envelope.source_mtime(path)
+        for mood in moods:
+            style = MOOD_STYLES[mood]
+            vkey = variant_key(mood, key)
+            dst = os.path.join(folder, vkey + ".wav")
+            entry = meta.get(vkey, {})
+            if (not force and os.path.exists(dst) and entry.get("style") == style
+                    and entry.get("variant_source_mtime", 0) >= mtime):
+                continue
+            yield key, mood, path, dst, style, mtime
+
+
+def render_folder(folder=clip_meta.SOUND_FOLDER, categories=VARIANT_CATEGORIES,
+                  moods=tuple(MOOD_STYLES), force=False, workers=WORKERS):
+    todo = list(jobs(folder, categories, moods, force))
+    start = time.perf_counter()
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [(job, pool.submit(render, job[2], job[3], job[4])) for job in todo]
+        results = []
+        for (key, mood, src, dst, style, mtime), future in futures:
+            try:
+                entry = future.result()
+            except Exception as e:
+                print(f"Failed: {src} ({mood}): {e}")
+                continue
+            entry.update({"variant_of": key, "mood": mood, "style": style, "variant_source_mtime": mtime})
+            results.append((key, mood, entry))
+            print(f"Variant: {variant_key(mood, key)}")
+    elapsed = time.perf_counter() - start
+
+    # Only this process writes clips.json
+    meta = clip_meta.load(folder)
+    clips = meta.setdefault("clips", {})
+    for key, mood, entry in results:
+        vkey = variant_key(mood, key)
+        clips[vkey] = entry
+        clips.setdefault(key, {}).setdefault("variants", {})[mood] = vkey
+    clip_meta.save(meta, folder)
+    return len(results), len(todo), elapsed
+
+
+if __name__ == "__main__":
+    # Usage: python mood_variants.py [folder] [--force] [--categories=bye,laugh] [--moods=sad]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    folder = args[0] if args else clip_meta.SOUND_FOLDER
+    categories, moods = VARIANT_CATEGORIES, tuple(MOOD_STYLES)
+    for a in sys.argv[1:]:
+        if a.startswith("--categories="):
+            categories = a.split("=", 1)[1].split(",")
+        elif a.startswith("--moods="):
+            moods = tuple(a.split("=", 1)[1].split(","))
+
+    done, todo, elapsed = render_folder(folder, categories, moods, "--force" in sys.argv)
+    print(f"Done! {done} of {todo} variants rendered in {elapsed:.1f}s, "
+          f"metadata in {clip_meta.meta_path(folder)}")
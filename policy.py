@@ -0,0 +1,133 @@
+import random
+import threading
+from collections import defaultdict
+
+# ===== BANDS =====
+STARVING = "starving"
+HUNGRY = "hungry"
+FED = "fed"
+HUNGER_BANDS = (STARVING, HUNGRY, FED)
+STARVING_BELOW = 20
+HUNGRY_BELOW = 40
+
+TIME_BANDS = ("morning", "afternoon", "evening", "night")
+# Hour → band, computed once instead of re-testing the ranges on every call
+TIME_BAND_BY_HOUR = [
+    "morning" if 5 <= h < 12 else
+    "afternoon" if 12 <= h < 17 else
+    "evening" if 17 <= h < 21 else
+    "night"
+    for h in range(24)
+]
+# =================
+
+
+def hunger_band(hunger):
+    if hunger < STARVING_BELOW:
+        return STARVING
+    if hunger < HUNGRY_BELOW:
+        return HUNGRY
+    return FED
+
+
+def time_band(hour):
+    return TIME_BAND_BY_HOUR[hour]
+
+
+class ShuffleBag:
+    """Weighted shuffle bag.
+
+    Each round holds every clip `weight` times in shuffled order, so clips
+    come up in proportion to their weight, and the same clip is never
+    drawn twice in a row, including across rounds (unless one clip holds
+    more than half of the bag, where a repeat cannot be avoided).
+    """
+
+    def __init__(self, items, weights=None, last=None):
+        self.items = list(items)
+        self.weights = weights or {}
+        self.bag = []
+        self.last = last
+
+    def refill(self):
+        counts = {item: max(1, int(self.weights.get(item, 1))) for item in self.items}
+        total = sum(counts.values())
+        order = []
+        prev = self.last
+
+        while total:
+            candidates = [item for item in counts if item != prev] or list(counts)
+            top = max(candidates, key=counts.get)
+            if counts[top] * 2 > total:
+                # top must go now or it will be forced to repeat later
+                item = top
+            else:
+                item = random.choices(candidates, [counts[c] for c in candidates])[0]
+            order.append(item)
+            counts[item] -= 1
+            if not counts[item]:
+                del counts[item]
+            total -= 1
+            prev = item
+
+        order.reverse()     # next() pops from the end
+        self.bag = order
+
+    def next(self):
+        if not self.items:
+            return None
+        if not self.bag:
+            self.refill()
+        self.last = self.bag.pop()
+        return self.last
+
+
+class BehaviorPolicy:
+    """Precomputed candidate pools, one shuffle bag per policy key.
+
+    A key (e.g. (mood, hunger band, time band)) is defined once with the
+    catalog categories it draws from. Catalog or weight changes rebuild
+    only the bags that depend on the changed category or clip.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog          # category → list of clip names
+        self.weights = {}               # clip name → integer weight
+        self.sources = {}               # key → categories
+        self.tables = {}                # key → ShuffleBag
+        self.deps = defaultdict(set)    # category → keys using it
+        self.lock = threading.Lock()
+
+    def define(self, key, categories):
+        with self.lock:
+            self.sources[key] = tuple(categories)
+            for category in categories:
+                self.deps[category].add(key)
+            self.rebuild(key)
+
+    def rebuild(self, key):
+        items = []
+        for category in self.sources[key]:
+            items.extend(self.catalog.get(category, []))
+        old = self.tables.get(key)
+        self.tables[key] = ShuffleBag(items, self.weights, old.last if old else None)
+
+    def pick(self, key):
+        with self.lock:
+            bag = self.tables.get(key)
+            return bag.next() if bag else None
+
+    def update_category(self, category, names=None):
+        """Call after the catalog list for `category` changed (or pass the new list)."""
+        with self.lock:
+            if names is not None:
+                self.catalog[category] = names
+            for key in self.deps.get(category, ()):
+                self.rebuild(key)
+
+    def set_weight(self, name, weight):
+        with self.lock:
+            self.weights[name] = weight
+            for key, bag in list(self.tables.items()):
+                if name in bag.items:
+                    self.rebuild(key)
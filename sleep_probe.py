@@ -0,0 +1,69 @@
+import os
+import sys
+import glob
+import time
+import resource
+
+import audio_backend
+
+os.environ.setdefault(audio_backend.BACKEND_ENV, "null")
+
+import main
+
+# Short locks so the probe reaches SLEEPING quickly
+main.WAKEUP_LOCK = main.NORMAL_LOCK = main.SNORE_LOCK = 0.2
+
+
+def context_switches():
+    """Voluntary + involuntary context switches over all threads (Linux)."""
+    total = 0
+    for status in glob.glob("/proc/self/task/*/status"):
+        try:
+            with open(status) as f:
+                for line in f:
+                    if "ctxt_switches" in line:
+                        total += int(line.split()[1])
+        except FileNotFoundError:
+            pass    # thread exited while we were reading
+    return total
+
+
+def cpu_seconds():
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    return usage.ru_utime + usage.ru_stime
+
+
+def measure(seconds):
+    switches, cpu, start = context_switches(), cpu_seconds(), time.monotonic()
+    time.sleep(seconds)
+    elapsed = time.monotonic() - start
+    # The probe's own sleep accounts for one switch
+    wakeups = max(0, context_switches() - switches - 1)
+    return wakeups / elapsed, (cpu_seconds() - cpu) / elapsed * 100
+
+
+if __name__ == "__main__":
+    # Usage: python sleep_probe.py [seconds]
+    if not os.path.isdir("/proc/self/task"):
+        print("sleep_probe needs Linux /proc to count wakeups")
+        sys.exit(1)
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 10
+
+    devnull = open(os.devnull, "w")
+    stdout, sys.stdout = sys.stdout, devnull
+
+    # The shipped FSM, wake word listener included
+    fsm = main.FurbyFSM()
+    fsm.wait_for_state(main.State.IDLE)
+    idle = measure(seconds)
+
+    fsm.post(main.Event(main.Priority.GENERIC.value, "idle_timeout"))
+    fsm.wait_for_state(main.State.SLEEPING)
+    time.sleep(0.5)     # let the last snore finish and the device close
+    sleeping = measure(seconds)
+
+    sys.stdout = stdout
+    print(f"{'state':<10} {'wakeups/s':>10} {'CPU %':>8}")
+    print(f"{'IDLE':<10} {idle[0]:>10.2f} {idle[1]:>8.3f}")
+    print(f"{'SLEEPING':<10} {sleeping[0]:>10.2f} {sleeping[1]:>8.3f}")
+    fsm.stop()
@@ -0,0 +1,162 @@
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+
+# ===== CONFIG =====
+SOUND_EXTS = (".wav", ".fzc")
+POLL_INTERVAL = 2       # seconds, only used when inotify is not available
+# ==================
+
+# inotify(7) constants
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+EVENT_HEADER = struct.Struct("iIII")    # wd, mask, cookie, len
+
+
+class SoundWatcher:
+    """Reports sound files added, removed or modified in a set of folders.
+
+    Uses inotify on Linux and falls back to polling elsewhere. Calls
+    on_change(kind, folder, filename) with kind "add", "remove" or "modify".
+    Only the changed file is reported; folders are never rescanned as a
+    whole except by the polling fallback.
+    """
+
+    def __init__(self, folders, on_change, poll_interval=POLL_INTERVAL):
+        self.folders = [f for f in folders if os.path.isdir(f)]
+        self.on_change = on_change
+        self.poll_interval = poll_interval
+        self.known = {folder: self.scan(folder) for folder in self.folders}
+        self.running = False
+        self.stop_r, self.stop_w = os.pipe()
+
+    @staticmethod
+    def scan(folder):
+        files = {}
+        for entry in os.scandir(folder):
+            if entry.name.endswith(SOUND_EXTS) and entry.is_file():
+                st = entry.stat()
+                files[entry.name] = (st.st_mtime_ns, st.st_size)
+        return files
+
+    def start(self):
+        self.running = True
+        try:
+            fd, watches = self.inotify_setup()
+        except OSError as e:
+            print(f"[RELOAD] inotify unavailable ({e}), polling every {self.poll_interval}s")
+            threading.Thread(target=self.poll_loop, daemon=True).start()
+            return
+        print(f"[RELOAD] watching {', '.join(self.folders)}")
+        threading.Thread(target=self.inotify_loop, args=(fd, watches), daemon=True).start()
+
+    def stop(self):
+        self.running = False
+        os.write(self.stop_w, b"\0")
+
+    def emit(self, kind, folder, name):
+        try:
+            self.on_change(kind, folder, name)
+        except Exception as e:
+            print(f"[RELOAD] failed to apply {kind} {name}: {e}")
+
+    # ---- inotify ----
+    def inotify_setup(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("not linux")
+        libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        fd = libc.inotify_init1(os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+
+        watches = {}
+        for folder in self.folders:
+            wd = libc.inotify_add_watch(fd, os.fsencode(folder), WATCH_MASK)
+            if wd < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), f"inotify_add_watch {folder} failed")
+            watches[wd] = folder
+        return fd, watches
+
+    def inotify_loop(self, fd, watches):
+        while self.running:
+            ready, _, _ = select.select([fd, self.stop_r], [], [])
+            if self.stop_r in ready:
+                break
+            data = os.read(fd, 64 * 1024)
+
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+                offset += EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b"\0").decode(errors="replace")
+                offset += length
+
+                if mask & IN_Q_OVERFLOW:
+                    # Kernel dropped events: fall back to a diff for each folder
+                    for folder in self.folders:
+                        self.diff(folder)
+                    continue
+                folder = watches.get(wd)
+                if folder is None or not name.endswith(SOUND_EXTS):
+                    continue
+                self.file_event(folder, name, removed=bool(mask & (IN_DELETE | IN_MOVED_FROM)))
+        os.close(fd)
+
+    def file_event(self, folder, name, removed):
+        known = self.known[folder]
+        if removed:
+            if known.pop(name, None) is not None:
+                self.emit("remove", folder, name)
+            return
+
+        try:
+            st = os.stat(os.path.join(folder, name))
+        except FileNotFoundError:
+            return
+        kind = "modify" if name in known else "add"
+        known[name] = (st.st_mtime_ns, st.st_size)
+        self.emit(kind, folder, name)
+
+    # ---- Polling fallback ----
+    def poll_loop(self):
+        while self.running:
+            ready, _, _ = select.select([self.stop_r], [], [], self.poll_interval)
+            if ready:
+                break
+            for folder in self.folders:
+                self.diff(folder)
+
+    def diff(self, folder):
+        old = self.known[folder]
+        new = self.scan(folder)
+        self.known[folder] = new
+        for name in old.keys() - new.keys():
+            self.emit("remove", folder, name)
+        for name, stamp in new.items():
+            if name not in old:
+                self.emit("add", folder, name)
+            elif old[name] != stamp:
+                self.emit("modify", folder, name)
+
+
+if __name__ == "__main__":
+    # Usage: python sound_watcher.py [folder ...]
+    watcher = SoundWatcher(sys.argv[1:] or ["sounds/", "sounds/clock/"],
+                           lambda kind, folder, name: print(f"[RELOAD] {kind} {folder}{name}"))
+    watcher.start()
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        watcher.stop()